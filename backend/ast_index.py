@@ -0,0 +1,220 @@
+import ast
+import hashlib
+import json
+import os
+from collections import Counter
+from routing import classify_function
+
+INDEX_VERSION = 2
+
+# Each symbol is stored as a compact row with these fields, in this order (tier is None for classes)
+SYMBOL_FIELDS = ("kind", "qualname", "lineno", "end_lineno", "has_docstring", "tier")
+FUNCTION_KINDS = ("function", "async_function", "method", "async_method")
+
+def has_docstring(node):
+    """Check whether a module, class or function node starts with a docstring."""
+    return bool(
+        node.body
+        and isinstance(node.body[0], ast.Expr)
+        and isinstance(node.body[0].value, ast.Constant)
+        and isinstance(node.body[0].value.value, str)
+    )
+
+def collect_imports(tree):
+    """Map each imported top-level module to the names imported from it (empty if imported whole)."""
+    imports = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                mod = alias.name.split(".")[0]
+                if mod not in imports:
+                    imports[mod] = set()  # module imported as whole; no specific functions
+        elif isinstance(node, ast.ImportFrom) and node.module:
+            mod = node.module.split(".")[0]
+            funcs = {alias.name for alias in node.names}
+            if mod in imports:
+                imports[mod] |= funcs
+            else:
+                imports[mod] = funcs
+    return imports
+
+class SymbolCollector(ast.NodeVisitor):
+    """Record classes, methods, nested and async functions with qualified names and spans."""
+
+    def __init__(self):
+        self.symbols = []
+        self._scope = []  # stack of (name, is_class)
+
+    def _qualname(self, name):
+        parts = []
+        for scope_name, is_class in self._scope:
+            parts.append(scope_name if is_class else f"{scope_name}.<locals>")
+        parts.append(name)
+        return ".".join(parts)
+
+    def _add(self, node, kind):
+        self.symbols.append([
+            kind,
+            self._qualname(node.name),
+            node.lineno,
+            getattr(node, "end_lineno", node.lineno),
+            has_docstring(node),
+            None if kind == "class" else classify_function(node),
+        ])
+
+    def _visit_function(self, node, is_async):
+        in_class = bool(self._scope) and self._scope[-1][1]
+        kind = ("async_" if is_async else "") + ("method" if in_class else "function")
+        self._add(node, kind)
+        self._scope.append((node.name, False))
+        self.generic_visit(node)
+        self._scope.pop()
+
+    def visit_FunctionDef(self, node):
+        self._visit_function(node, is_async=False)
+
+    def visit_AsyncFunctionDef(self, node):
+        self._visit_function(node, is_async=True)
+
+    def visit_ClassDef(self, node):
+        self._add(node, "class")
+        self._scope.append((node.name, True))
+        self.generic_visit(node)
+        self._scope.pop()
+
+def undocumented_function_nodes(tree):
+    """Return (key, node) for each function lacking a docstring, innermost first.
+
+    This is the order DocstringInserter reaches them in, so a file's
+    conversation history sees nested functions before their parents. The key
+    is the qualname, suffixed with the line number when several functions
+    share it (a property's getter and setter, alternative definitions under
+    if/else), so it names exactly one function.
+    """
+    found = []
+
+    def walk(node, scope):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                walk(child, scope + [child.name, "<locals>"])
+                if not has_docstring(child):
+                    found.append((".".join(scope + [child.name]), child))
+            elif isinstance(child, ast.ClassDef):
+                walk(child, scope + [child.name])
+            else:
+                walk(child, scope)
+
+    walk(tree, [])
+    counts = Counter(qualname for qualname, _ in found)
+    return [(qualname if counts[qualname] == 1 else f"{qualname}:{func_node.lineno}", func_node)
+            for qualname, func_node in found]
+
+def build_file_index(project_root, rel_path):
+    """Parse one file and return its index entry."""
+    full_path = os.path.join(project_root, rel_path)
+    with open(full_path, "rb") as f:
+        raw = f.read()
+    entry = {
+        "sha256": hashlib.sha256(raw).hexdigest(),
+        "size": len(raw),
+        "lines": raw.count(b"\n") + 1,
+        "module_docstring": False,
+        "symbols": [],
+        "imports": {},
+        "error": None,
+    }
+    try:
+        tree = ast.parse(raw.decode("utf-8"), filename=full_path)
+    except (SyntaxError, UnicodeDecodeError, ValueError) as ex:
+        entry["error"] = f"{type(ex).__name__}: {ex}"
+        return entry
+    collector = SymbolCollector()
+    collector.visit(tree)
+    entry["module_docstring"] = has_docstring(tree)
+    entry["symbols"] = collector.symbols
+    entry["imports"] = {mod: sorted(funcs) for mod, funcs in collect_imports(tree).items()}
+    return entry
+
+def build_project_index(project_root, project_files):
+    """Build the index for every file in project_files (paths relative to project_root)."""
+    return {
+        "version": INDEX_VERSION,
+        "symbol_fields": list(SYMBOL_FIELDS),
+        "files": {rel_path: build_file_index(project_root, rel_path) for rel_path in project_files},
+    }
+
+def save_index(index, path):
+    """Persist the index as JSON, or as msgpack when path ends with .msgpack."""
+    if path.endswith(".msgpack"):
+        import msgpack  # optional dependency, only needed for the binary format
+        with open(path, "wb") as f:
+            f.write(msgpack.packb(index))
+    else:
+        # Written one file entry at a time; json.dump would encode the whole index in memory first
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("{")
+            for key, value in index.items():
+                if key != "files":
+                    f.write(f"{json.dumps(key)}:{json.dumps(value, separators=(',', ':'))},")
+            f.write('"files":{')
+            for i, (rel_path, entry) in enumerate(index["files"].items()):
+                f.write(f"{',' if i else ''}{json.dumps(rel_path)}:{json.dumps(entry, separators=(',', ':'))}")
+            f.write("}}")
+
+def load_index(path):
+    """Load an index written by save_index."""
+    if path.endswith(".msgpack"):
+        import msgpack
+        with open(path, "rb") as f:
+            return msgpack.unpackb(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def trim_index(index):
+    """Drop index data that documenting no longer needs, to bound memory on large projects.
+
+    Imports already live on the graph's edges and only top-level symbols are
+    read afterwards (for import-cycle summaries), so the rest is released.
+    """
+    for entry in index["files"].values():
+        entry["imports"] = {}
+        entry["symbols"] = [row for row in entry["symbols"] if "." not in row[1]]
+
+def file_imports(entry):
+    """Return an index entry's imports as {module: set(names)}, the shape used by the graph builder."""
+    return {mod: set(funcs) for mod, funcs in entry["imports"].items()}
+
+def undocumented_functions(entry):
+    """Return the qualified names of functions and methods in an entry that lack docstrings."""
+    return [qualname for kind, qualname, _, _, documented, _ in entry["symbols"]
+            if kind in FUNCTION_KINDS and not documented]
+
+def undocumented_tiers(entry):
+    """Count an entry's undocumented functions per routing tier."""
+    counts = {}
+    for kind, _, _, _, documented, tier in entry["symbols"]:
+        if kind in FUNCTION_KINDS and not documented:
+            counts[tier] = counts.get(tier, 0) + 1
+    return counts
+
+def undocumented_spans(entry, tier):
+    """Line counts of the undocumented functions routed to a tier."""
+    return [end - start + 1 for kind, _, start, end, documented, symbol_tier in entry["symbols"]
+            if kind in FUNCTION_KINDS and not documented and symbol_tier == tier]
+
+def index_stats(index):
+    """Summarise an index for logs and the UI."""
+    stats = {"files": 0, "lines": 0, "classes": 0, "functions": 0, "undocumented_functions": 0, "parse_errors": 0}
+    for entry in index["files"].values():
+        stats["files"] += 1
+        stats["lines"] += entry["lines"]
+        stats["parse_errors"] += entry["error"] is not None
+        for kind, _, _, _, documented, tier in entry["symbols"]:
+            if kind == "class":
+                stats["classes"] += 1
+            else:
+                stats["functions"] += 1
+                stats["undocumented_functions"] += not documented
+                if not documented:
+                    stats[f"{tier}_tier"] = stats.get(f"{tier}_tier", 0) + 1
+    return stats
@@ -0,0 +1,133 @@
+"""Peak-RSS benchmark of the documentation pipeline on a synthetic project.
+
+    python benchmark_memory.py --files 50000
+
+Generates the project once, then runs main.main() in a fresh subprocess for
+each mode (default and memory-bounded) and reports the peak RSS of each run.
+LLM calls are replaced by an offline document_file that returns fixed-size
+placeholder docstrings, so only the pipeline's own memory is measured.
+"""
+import argparse
+import ast
+import io
+import json
+import os
+import random
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PLACEHOLDER_DOC = "Placeholder docstring standing in for an LLM response. " * 4
+
+def generate_project(root, files, per_package=100, imports=3, functions=4, seed=0):
+    """Write `files` modules in packages of `per_package`, each importing from up to `imports` earlier modules."""
+    rng = random.Random(seed)
+    for i in range(files):
+        package = os.path.join(root, f"pkg_{i // per_package:04d}")
+        if i % per_package == 0:
+            os.makedirs(package, exist_ok=True)
+        lines = []
+        for parent in sorted(set(rng.randrange(i) for _ in range(min(i, imports)))):
+            lines.append(f"from mod_{parent:05d} import func_0, func_{rng.randrange(functions)}")
+        lines.append("")
+        for k in range(functions):
+            lines += [f"def func_{k}(value, scale={i}):",
+                      f"    if value > {k}:",
+                      f"        return value * scale + {k}",
+                      "    return value", ""]
+        lines += [f"class Model{i}:", "    def run(self, value):", "        return func_0(value)", ""]
+        with open(os.path.join(package, f"mod_{i:05d}.py"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def current_rss_mb():
+    """Current resident set size in MiB, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def run_child(project_root, mode, work_dir):
+    """Run the pipeline once in this process and print its result as JSON."""
+    os.environ.update({
+        "OUTPUT_MODE": "zip",
+        "OUTPUT_PATH": os.path.join(work_dir, f"{mode}.zip"),
+        "DOC_CACHE_DIR": os.path.join(work_dir, f"{mode}_cache"),
+    })
+    import main  # imported after the environment is set; the doc cache reads it at import time
+
+    def offline_document_file(node, file_content, shared_context=None, rank=0, functions=None):
+        """Stand-in for document_file that keeps its memory behaviour but makes no LLM calls."""
+        tree = ast.parse(file_content)
+        func_documented = {}
+        for _, func_node in main.undocumented_function_nodes(tree):
+            func_node.body.insert(0, ast.Expr(value=ast.Constant(value=PLACEHOLDER_DOC)))
+            func_documented[func_node.name] = PLACEHOLDER_DOC
+        return f"# Overview of {node}\n\n" + ast.unparse(tree), func_documented
+
+    main.document_file = offline_document_file
+    sys.stdin = io.StringIO(project_root + "\n")
+    start = time.time()
+    main.main(memory_bounded=(mode == "bounded"))
+    seconds = time.time() - start
+    # Final RSS shows what is still held once documenting is done; peak RSS is usually reached in analysis
+    final = current_rss_mb()
+    sys.__stdout__.write(json.dumps({"mode": mode, "peak_rss_mb": round(peak_rss_mb(), 1),
+                                     "final_rss_mb": final and round(final, 1),
+                                     "seconds": round(seconds, 1)}) + "\n")
+
+def run_mode(project_root, mode, work_dir):
+    """Benchmark one mode in a fresh interpreter so peak RSS is not shared between runs."""
+    # Pipeline logs go to a file; only the last line of stdout is the result
+    with open(os.path.join(work_dir, f"{mode}.log"), "w") as log:
+        proc = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, "--project", project_root,
+             "--work-dir", work_dir],
+            stdout=subprocess.PIPE, stderr=log, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=50000)
+    parser.add_argument("--project", help="benchmark an existing project instead of generating one")
+    parser.add_argument("--modes", default="default,bounded")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--work-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        sys.stdout = open(os.devnull, "w")  # the pipeline's own logs would drown the result line
+        run_child(args.project, args.child, args.work_dir)
+        return
+
+    work_dir = tempfile.mkdtemp(prefix="memory_benchmark_")
+    try:
+        project_root = args.project
+        if not project_root:
+            project_root = os.path.join(work_dir, "project")
+            start = time.time()
+            generate_project(project_root, args.files)
+            print(f"Generated {args.files} files in {time.time() - start:.1f} seconds")
+        for mode in args.modes.split(","):
+            result = run_mode(project_root, mode, work_dir)
+            final = f", final {result['final_rss_mb']:.1f} MiB" if result["final_rss_mb"] else ""
+            print(f"{result['mode']:>8}: peak RSS {result['peak_rss_mb']:.1f} MiB{final} in {result['seconds']:.1f} seconds")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on the number of in-flight LLM requests.
+
+    Every successful request grows the limit by 1/limit (about +1 per round of
+    requests). A throttled request (HTTP 429) or one that failed from overload
+    (timeouts, connection errors, 5xx) multiplies the limit by backoff; other
+    failures, such as a bad request for one file, are counted but not penalised. Decreases are spaced at least one average latency apart
+    so a single burst of 429s only halves the limit once. Latency alone only
+    backs off when target_latency is set: LLM latency mostly tracks output
+    length, so slow requests are not a sign of overload by themselves.
+
+    Waiting requests are admitted in ascending rank (a node's position in the
+    schedule), first come first served among equal ranks, so the critical
+    path keeps its head start when requests queue behind the limit.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, target_latency=None,
+                 backoff=0.5, on_change=None):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target_latency = target_latency
+        self.backoff = backoff
+        self.on_change = on_change
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._in_flight = 0
+        self._cond = threading.Condition()
+        self._waiters = []  # heap of (rank, arrival) for requests waiting for a slot
+        self._arrivals = itertools.count()
+        self._last_decrease = 0.0
+        self._avg_latency = None
+        self._requests = 0
+        self._throttled = 0
+        self._errors = 0
+
+    @property
+    def limit(self):
+        return max(self.minimum, int(math.floor(self._limit)))
+
+    def acquire(self, rank=0):
+        with self._cond:
+            entry = (rank, next(self._arrivals))
+            heapq.heappush(self._waiters, entry)
+            while self._waiters[0] != entry or self._in_flight >= self.limit:
+                self._cond.wait()
+            heapq.heappop(self._waiters)
+            self._in_flight += 1
+            # The next waiter in line may fit under the limit too
+            self._cond.notify_all()
+
+    def release(self, latency=None, throttled=False, failed=False, overloaded=False):
+        with self._cond:
+            self._in_flight -= 1
+            before = self.limit
+            self._requests += 1
+            if throttled:
+                self._throttled += 1
+                self._decrease()
+            elif failed:
+                self._errors += 1
+                if overloaded:
+                    self._decrease()
+            elif latency is not None:
+                self._record_latency(latency)
+                if self.target_latency and latency > self.target_latency:
+                    self._decrease()
+                else:
+                    self._limit = min(self.maximum, self._limit + 1.0 / self._limit)
+            after = self.limit
+            self._cond.notify_all()
+        if after != before and self.on_change:
+            self.on_change(before, after, self.snapshot())
+
+    @contextmanager
+    def slot(self, is_throttle=lambda ex: False, is_overload=lambda ex: False, rank=0):
+        """Hold one request slot, reporting latency or failure on exit.
+
+        is_throttle and is_overload classify a failure; only those back off.
+        """
+        self.acquire(rank)
+        start_time = time.time()
+        try:
+            yield
+        except Exception as ex:
+            self.release(throttled=is_throttle(ex), failed=True, overloaded=is_overload(ex))
+            raise
+        self.release(latency=time.time() - start_time)
+
+    def _record_latency(self, latency):
+        if self._avg_latency is None:
+            self._avg_latency = latency
+        else:
+            self._avg_latency = 0.8 * self._avg_latency + 0.2 * latency
+
+    def _decrease(self):
+        now = time.time()
+        if now - self._last_decrease < (self._avg_latency or 0.0):
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.minimum), self._limit * self.backoff)
+
+    def snapshot(self):
+        """Return current limiter metrics as a plain dict."""
+        with self._cond:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "requests": self._requests,
+                "throttled": self._throttled,
+                "errors": self._errors,
+                "avg_latency": round(self._avg_latency, 3) if self._avg_latency is not None else None,
+            }
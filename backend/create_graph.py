@@ -4,37 +4,53 @@ import sys
 import pkg_resources
 import networkx as nx
 import matplotlib.pyplot as plt
-from pathlib import Path
+from ast_index import collect_imports, file_imports
+from dedup import is_vendor_dir, skip_vendored_default
+from joblog import log_event
 
-def get_python_files(root_dir):
-    """Recursively get all Python files in a project using pathlib."""
-    root = Path(root_dir)
-    print([str(path.relative_to(root)) for path in root.rglob("*.py")])
-    return [str(path.relative_to(root)) for path in root.rglob("*.py")]
+def get_python_files(root_dir, skip_vendored=None):
+    """Recursively get all Python files in a project.
+
+    Vendored and generated directories (site-packages, virtualenvs, build, ...)
+    are skipped unless skip_vendored is False or SKIP_VENDORED=0.
+    """
+    if skip_vendored is None:
+        skip_vendored = skip_vendored_default()
+    files = []
+    skipped = []
+    for dirpath, dirnames, filenames in os.walk(root_dir):
+        if skip_vendored:
+            kept = []
+            for d in sorted(dirnames):
+                if is_vendor_dir(os.path.join(dirpath, d)):
+                    skipped.append(os.path.relpath(os.path.join(dirpath, d), root_dir))
+                else:
+                    kept.append(d)
+            dirnames[:] = kept
+        for filename in sorted(filenames):
+            if filename.endswith(".py"):
+                files.append(os.path.relpath(os.path.join(dirpath, filename), root_dir))
+    if skipped:
+        log_event(f"Skipped vendored directories: {skipped}", stage="index")
+    log_event(f"Found {len(files)} Python files", stage="index")
+    return files
 
 def extract_imports(file_path):
     """Extract import statements from a Python file."""
     with open(file_path, "r", encoding="utf-8") as f:
         tree = ast.parse(f.read(), filename=file_path)
 
-    imports = {}  # key: module, value: set of functions (empty set if not specified)
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                mod = alias.name.split(".")[0]
-                if mod not in imports:
-                    imports[mod] = set()  # module imported as whole; no specific functions
-        elif isinstance(node, ast.ImportFrom) and node.module:
-            mod = node.module.split(".")[0]
-            funcs = {alias.name for alias in node.names}
-            if mod in imports:
-                imports[mod] |= funcs
-            else:
-                imports[mod] = funcs
-    
-    return imports
-
-def is_internal_import(import_name, project_files):
+    # key: module, value: set of functions (empty set if not specified)
+    return collect_imports(tree)
+
+def basename_index(project_files):
+    """Map each file basename to the first project file with that name."""
+    by_basename = {}
+    for file in project_files:
+        by_basename.setdefault(os.path.basename(file), file)
+    return by_basename
+
+def is_internal_import(import_name, project_files, by_basename=None):
     """Check if the import corresponds to a file in the project,
        by comparing the expected basename.
     """
@@ -42,16 +58,31 @@ def is_internal_import(import_name, project_files):
     # Direct match
     if candidate in project_files:
         return candidate
-    # Otherwise, search by basename match
+    # Otherwise, search by basename match (a dict lookup when the caller prebuilt the index)
+    if by_basename is not None:
+        return by_basename.get(candidate)
     for file in project_files:
         if os.path.basename(file) == candidate:
             return file
     return None
 
-def build_dependency_graph(root_dir):
-    """Construct a dependency graph for the project."""
-    project_files = get_python_files(root_dir)  # relative paths
+def build_dependency_graph(root_dir, index=None):
+    """Construct a dependency graph for the project.
+
+    When a precomputed AST index is given, its file list and imports are used
+    instead of walking and re-parsing the tree. Files the index could not
+    parse are left out, so they are never scheduled and are carried over as-is.
+    """
+    if index is not None:
+        unparsable = sorted(file for file, entry in index["files"].items() if entry["error"])
+        if unparsable:
+            log_event(f"Leaving {len(unparsable)} files that do not parse out of the graph: {unparsable}",
+                      level="warning", stage="graph")
+        project_files = [file for file, entry in index["files"].items() if not entry["error"]]
+    else:
+        project_files = get_python_files(root_dir)  # relative paths
     project_files_set = set(project_files)
+    by_basename = basename_index(project_files)
 
     # Get list of standard library modules
     stdlib_modules = set(sys.builtin_module_names)
@@ -66,13 +97,15 @@ def build_dependency_graph(root_dir):
         dep_graph.add_node(file)
 
     for file in project_files:
-        file_path = os.path.join(root_dir, file)
-        imports_dict = extract_imports(file_path)
+        if index is not None:
+            imports_dict = file_imports(index["files"][file])
+        else:
+            imports_dict = extract_imports(os.path.join(root_dir, file))
         for imp, funcs in imports_dict.items():
             if imp in stdlib_modules or imp in installed_packages:
                 continue  # Ignore these imports
 
-            parent_file = is_internal_import(imp, project_files_set)
+            parent_file = is_internal_import(imp, project_files_set, by_basename)
             # Eliminate self-loop edges
             if parent_file and parent_file != file:
                 dep_graph.add_edge(parent_file, file, imported_functions=funcs)
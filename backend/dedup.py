@@ -0,0 +1,111 @@
+import hashlib
+import json
+import os
+import threading
+from output_writer import atomic_write_text, prune_directory
+
+# Bump when prompts or the shape of cached results change, so older entries are never reused
+DOC_CACHE_VERSION = 2
+DOC_CACHE_MAX_FILES = int(os.getenv("DOC_CACHE_MAX_FILES", "100000"))
+DOC_CACHE_MAX_AGE = float(os.getenv("DOC_CACHE_MAX_AGE_DAYS", "30")) * 24 * 3600
+
+# Directories that hold vendored or generated code rather than first-party sources
+VENDOR_DIR_NAMES = {
+    "site-packages", "dist-packages", "venv", ".venv", "env", ".env", "virtualenv",
+    "build", "dist", "node_modules", "__pycache__", ".git", ".hg", ".tox", ".nox",
+    ".eggs", ".mypy_cache", ".pytest_cache", "third_party", "vendor", "_vendor",
+}
+
+def skip_vendored_default():
+    """Vendor detection is on unless SKIP_VENDORED=0."""
+    return os.getenv("SKIP_VENDORED", "1") != "0"
+
+def is_vendor_dir(dir_path):
+    """Check whether a directory holds vendored or generated code."""
+    name = os.path.basename(dir_path)
+    if name in VENDOR_DIR_NAMES or name.endswith((".egg-info", ".dist-info")):
+        return True
+    # A virtualenv root is recognisable by its pyvenv.cfg, whatever it is called
+    return os.path.isfile(os.path.join(dir_path, "pyvenv.cfg"))
+
+def content_hash(text):
+    """Return the SHA-256 of a file's text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def duplicate_groups(index):
+    """Group indexed files with identical content, keeping only groups of two or more."""
+    groups = {}
+    for rel_path, entry in index["files"].items():
+        groups.setdefault(entry["sha256"], []).append(rel_path)
+    return [sorted(paths) for paths in groups.values() if len(paths) > 1]
+
+class DocCache:
+    """Documented results keyed by file content, shared across identical files and jobs.
+
+    The first caller for a key claims it and documents the file; concurrent
+    callers for the same key wait for that result instead of repeating the
+    work. Results are kept on disk in cache_dir when one is given, otherwise
+    in memory for the lifetime of the job. The disk cache is pruned to
+    max_files entries no older than max_age seconds when it is opened.
+    """
+
+    def __init__(self, cache_dir=None, max_files=DOC_CACHE_MAX_FILES, max_age=DOC_CACHE_MAX_AGE):
+        self.cache_dir = cache_dir
+        self._memory = {}
+        self._pending = {}  # key -> threading.Event set when the owner finishes
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            prune_directory(cache_dir, max_files=max_files, max_age=max_age)
+
+    def key(self, file_content, context):
+        """Derive the cache key from the file content and everything else that shapes its documentation.
+
+        context must be JSON-serialisable: routing settings and models, the
+        summaries of imported functions, the shared import-cycle context, ...
+        """
+        return content_hash(f"{DOC_CACHE_VERSION}\0{json.dumps(context, sort_keys=True)}\0{file_content}")
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        if not self.cache_dir:
+            return self._memory.get(key)
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            os.utime(self._path(key))  # recently used entries survive pruning
+            return cached
+        except (OSError, ValueError):
+            return None
+
+    def lookup_or_claim(self, key):
+        """Return the cached result, or None when the caller now owns the key and must call complete/abandon."""
+        while True:
+            with self._lock:
+                cached = self.get(key)
+                if cached is not None:
+                    return cached
+                event = self._pending.get(key)
+                if event is None:
+                    self._pending[key] = threading.Event()
+                    return None
+            # Another thread is documenting identical content; wait for it, then look again
+            event.wait()
+
+    def complete(self, key, value):
+        with self._lock:
+            try:
+                if self.cache_dir:
+                    atomic_write_text(self._path(key), json.dumps(value))
+                else:
+                    self._memory[key] = value
+            finally:
+                # Waiters are released even if the write failed; they find no entry and claim the key
+                self._pending.pop(key).set()
+
+    def abandon(self, key):
+        """Release a claimed key without a result so a waiting caller can take it over."""
+        with self._lock:
+            self._pending.pop(key).set()
@@ -0,0 +1,143 @@
+import os
+import pathlib
+from abc import ABC, abstractmethod
+from output_writer import atomic_copy_file
+
+# Result files are uploaded in chunks of this size so no backend ever holds the whole ZIP in memory
+CHUNK_SIZE = int(os.getenv("DELIVERY_CHUNK_SIZE", str(8 * 1024 * 1024)))
+# S3 rejects multipart uploads whose non-final parts are smaller than this
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+def read_chunks(file_obj, chunk_size=CHUNK_SIZE):
+    """Yield successive chunks of file_obj until it is exhausted."""
+    while True:
+        chunk = file_obj.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+class DeliveryBackend(ABC):
+    """Deliver a finished result file and return a link the user can download it from."""
+
+    name = "base"
+
+    @abstractmethod
+    def deliver(self, file_path):
+        """Upload or copy file_path and return its download link."""
+
+class LocalDirectoryDelivery(DeliveryBackend):
+    """Copy results into a local directory, optionally served under base_url."""
+
+    name = "local"
+
+    def __init__(self, directory, base_url=None):
+        self.directory = directory
+        self.base_url = base_url
+
+    def deliver(self, file_path):
+        file_name = os.path.basename(file_path)
+        dest_path = os.path.join(self.directory, file_name)
+        atomic_copy_file(file_path, dest_path)
+        if self.base_url:
+            return f"{self.base_url.rstrip('/')}/{file_name}"
+        return pathlib.Path(os.path.abspath(dest_path)).as_uri()
+
+class DropboxDelivery(DeliveryBackend):
+    """Upload results to Dropbox through an upload session, one chunk at a time."""
+
+    name = "dropbox"
+
+    def __init__(self, token, chunk_size=CHUNK_SIZE, client=None):
+        if client is None:
+            import dropbox  # Dropbox SDK, only needed for this backend
+            client = dropbox.Dropbox(token)
+        self.dbx = client
+        self.chunk_size = chunk_size
+
+    def deliver(self, file_path):
+        import dropbox
+        dest_path = '/' + os.path.basename(file_path)
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            if file_size <= self.chunk_size:
+                self.dbx.files_upload(f.read(), dest_path, mute=True)
+            else:
+                session = self.dbx.files_upload_session_start(f.read(self.chunk_size))
+                cursor = dropbox.files.UploadSessionCursor(session_id=session.session_id, offset=f.tell())
+                commit = dropbox.files.CommitInfo(path=dest_path, mute=True)
+                while file_size - f.tell() > self.chunk_size:
+                    self.dbx.files_upload_session_append_v2(f.read(self.chunk_size), cursor)
+                    cursor.offset = f.tell()
+                self.dbx.files_upload_session_finish(f.read(self.chunk_size), cursor, commit)
+        shared_url = self.dbx.sharing_create_shared_link_with_settings(dest_path).url
+        return shared_url.replace('?dl=0', '?dl=1')  # direct download link
+
+class S3Delivery(DeliveryBackend):
+    """Multipart upload to S3-compatible object storage (AWS S3, MinIO, ...).
+
+    Pass client to use a pre-configured or fake boto3-style client; otherwise
+    one is created from the standard AWS environment variables. chunk_size is
+    raised to S3's 5 MiB minimum part size when set lower.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket, prefix="", endpoint_url=None, link_expiry=7 * 24 * 3600,
+                 chunk_size=CHUNK_SIZE, client=None):
+        if client is None:
+            import boto3  # optional dependency, only needed for this backend
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.link_expiry = link_expiry
+        self.chunk_size = max(chunk_size, S3_MIN_PART_SIZE)
+
+    def deliver(self, file_path):
+        key = self.prefix + os.path.basename(file_path)
+        upload = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)
+        upload_id = upload["UploadId"]
+        parts = []
+        try:
+            with open(file_path, 'rb') as f:
+                for part_number, chunk in enumerate(read_chunks(f, self.chunk_size), start=1):
+                    response = self.client.upload_part(
+                        Bucket=self.bucket, Key=key, UploadId=upload_id,
+                        PartNumber=part_number, Body=chunk,
+                    )
+                    parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except Exception:
+            # Don't leave orphaned parts behind in the bucket
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=upload_id)
+            raise
+        return self.client.generate_presigned_url(
+            "get_object", Params={"Bucket": self.bucket, "Key": key}, ExpiresIn=self.link_expiry,
+        )
+
+def make_delivery_backend(name=None):
+    """Create the backend selected by name / DELIVERY_BACKEND (dropbox, local or s3)."""
+    name = (name or os.getenv("DELIVERY_BACKEND", "dropbox")).lower()
+    if name == "dropbox":
+        dropbox_token = os.getenv('DROPBOX_ACCESS_TOKEN')
+        if not dropbox_token:
+            raise ValueError("DROPBOX_ACCESS_TOKEN is not set in the environment")
+        return DropboxDelivery(dropbox_token)
+    if name == "local":
+        directory = os.getenv("DELIVERY_DIR")
+        if not directory:
+            raise ValueError("DELIVERY_DIR is not set in the environment")
+        return LocalDirectoryDelivery(directory, base_url=os.getenv("DELIVERY_BASE_URL"))
+    if name == "s3":
+        bucket = os.getenv("S3_BUCKET")
+        if not bucket:
+            raise ValueError("S3_BUCKET is not set in the environment")
+        return S3Delivery(
+            bucket,
+            prefix=os.getenv("S3_PREFIX", ""),
+            endpoint_url=os.getenv("S3_ENDPOINT_URL"),
+        )
+    raise ValueError(f"Unknown delivery backend {name!r}, expected dropbox, local or s3")
@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+from array import array
+
+def memory_bounded_default():
+    """Memory-bounded mode is off unless MEMORY_BOUNDED=1."""
+    return os.getenv("MEMORY_BOUNDED") == "1"
+
+class CompactDependencyGraph:
+    """Read-only dependency graph stored as integer adjacency arrays.
+
+    Replaces the networkx graph once planning is done: node names are kept
+    once in a list, successors and predecessors live in CSR-style int arrays,
+    and each edge's imported functions are a tuple of interned strings.
+    """
+
+    def __init__(self, names, succ_offsets, succ_targets, edge_functions, pred_offsets, pred_sources):
+        self.names = names
+        self._id = {name: i for i, name in enumerate(names)}
+        self._succ_offsets = succ_offsets
+        self._succ_targets = succ_targets
+        self._edge_functions = edge_functions  # aligned with _succ_targets
+        self._pred_offsets = pred_offsets
+        self._pred_sources = pred_sources
+
+    @classmethod
+    def from_networkx(cls, graph):
+        names = list(graph.nodes)
+        ids = {name: i for i, name in enumerate(names)}
+        succ_offsets, succ_targets, edge_functions = array("i", [0]), array("i"), []
+        for name in names:
+            for child, data in graph.adj[name].items():
+                succ_targets.append(ids[child])
+                funcs = data.get("imported_functions") or ()
+                edge_functions.append(tuple(sorted(sys.intern(func) for func in funcs)))
+            succ_offsets.append(len(succ_targets))
+        pred_offsets, pred_sources = array("i", [0]), array("i")
+        for name in names:
+            for parent in graph.pred[name]:
+                pred_sources.append(ids[parent])
+            pred_offsets.append(len(pred_sources))
+        return cls(names, succ_offsets, succ_targets, edge_functions, pred_offsets, pred_sources)
+
+    def number_of_nodes(self):
+        return len(self.names)
+
+    def successors(self, node):
+        i = self._id[node]
+        return [self.names[j] for j in self._succ_targets[self._succ_offsets[i]:self._succ_offsets[i + 1]]]
+
+    def predecessors(self, node):
+        i = self._id[node]
+        return [self.names[j] for j in self._pred_sources[self._pred_offsets[i]:self._pred_offsets[i + 1]]]
+
+    def dependents(self, node):
+        """Map each node that imports from `node` to the functions it imports."""
+        i = self._id[node]
+        start, end = self._succ_offsets[i], self._succ_offsets[i + 1]
+        return {self.names[self._succ_targets[k]]: set(self._edge_functions[k]) for k in range(start, end)}
+
+def dependents_of(graph, node, exclude=()):
+    """Map each dependent of `node` to the functions it imports, for networkx or compact graphs.
+
+    Nodes in `exclude` (the rest of the node's import cycle) are skipped; they
+    are documented alongside it from the cycle's shared summary instead.
+    """
+    if isinstance(graph, CompactDependencyGraph):
+        dependents = graph.dependents(node)
+    else:
+        dependents = {child: set(data.get("imported_functions") or ()) for child, data in graph.adj[node].items()}
+    return {child: funcs for child, funcs in dependents.items() if child not in exclude}
+
+class SummaryStore:
+    """Summaries of imported functions, waiting for the dependent node that will use them.
+
+    A node's summaries are only read when that node is documented, so with
+    release=True they are dropped as soon as they are taken.
+    """
+
+    def __init__(self, release=False):
+        self.release = release
+        self._summaries = {}  # { dependent_node: { function_name: summary } }
+        self._lock = threading.Lock()
+
+    def add(self, node, summaries):
+        with self._lock:
+            self._summaries.setdefault(node, {}).update(summaries)
+
+    def take(self, node):
+        with self._lock:
+            if self.release:
+                return self._summaries.pop(node, {})
+            return dict(self._summaries.get(node, {}))
+
+    def __len__(self):
+        return len(self._summaries)
@@ -0,0 +1,177 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from output_writer import atomic_write_text, prune_directory
+
+# Graphs with more nodes than this skip pyvis and use the compact JSON format
+LARGE_GRAPH_THRESHOLD = int(os.getenv("GRAPH_LARGE_THRESHOLD", "300"))
+# Layouts are cached across jobs by graph_key, so re-uploading the same project reuses its layout
+LAYOUT_CACHE_DIR = os.getenv("LAYOUT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "code_scribe_layouts"))
+LAYOUT_CACHE_MAX_FILES = int(os.getenv("LAYOUT_CACHE_MAX_FILES", "50"))
+LEVEL_SPACING = 300
+NODE_SPACING = 40
+
+def is_large_graph(graph):
+    """Decide whether to use the large-graph mode (GRAPH_MODE=large/html forces either)."""
+    mode = os.getenv("GRAPH_MODE", "auto").lower()
+    if mode in ("large", "html"):
+        return mode == "large"
+    return graph.number_of_nodes() > LARGE_GRAPH_THRESHOLD
+
+def cluster_of(node, level, cluster_mode="package"):
+    """Return the cluster a node collapses into: its top-level package, or its level."""
+    if cluster_mode == "level":
+        return f"level {level}"
+    parts = os.path.normpath(node).split(os.sep)
+    return parts[0] if len(parts) > 1 else "."
+
+def graph_key(graph):
+    """Hash the graph's nodes and edges so a cached layout is only reused for the same graph."""
+    digest = hashlib.sha256()
+    for node in sorted(graph.nodes):
+        digest.update(node.encode("utf-8") + b"\0")
+    for u, v in sorted(graph.edges):
+        digest.update(f"{u}\0{v}\1".encode("utf-8"))
+    return digest.hexdigest()
+
+def compute_layout(graph, levels, cluster_mode="package"):
+    """Lay nodes out in columns by level, grouped by cluster within each column.
+
+    This is linear in the number of nodes, unlike a physics layout in the browser.
+    """
+    positions = {}
+    for level, nodes in levels.items():
+        column = sorted(nodes, key=lambda node: (cluster_of(node, level, cluster_mode), node))
+        offset = (len(column) - 1) * NODE_SPACING / 2
+        for row, node in enumerate(column):
+            positions[node] = (level * LEVEL_SPACING, row * NODE_SPACING - offset)
+    return positions
+
+def load_or_compute_layout(graph, levels, cache_dir=LAYOUT_CACHE_DIR, cluster_mode="package"):
+    """Return the cached layout for this graph, computing and caching it on a miss.
+
+    The cache is shared between jobs and keyed by graph_key, so any upload with
+    the same files and imports reuses the layout; it keeps the newest
+    LAYOUT_CACHE_MAX_FILES layouts.
+    """
+    cache_path = os.path.join(cache_dir, f"{graph_key(graph)}.{cluster_mode}.json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            positions = {node: tuple(pos) for node, pos in json.load(f).items()}
+        os.utime(cache_path)  # keep recently used layouts from being pruned
+        return positions
+    except (OSError, ValueError, AttributeError):
+        pass
+    positions = compute_layout(graph, levels, cluster_mode)
+    atomic_write_text(cache_path, json.dumps(positions))
+    prune_directory(cache_dir, max_files=LAYOUT_CACHE_MAX_FILES)
+    return positions
+
+def compact_graph(graph, levels, positions, cluster_mode="package"):
+    """Build the compact JSON graph consumed by the DependencyGraph component.
+
+    Nodes are rows of [id, x, y, level, cluster index], ordered by level so the
+    client can render them progressively; edges are [source row, target row].
+    Clusters and the aggregated edges between them give a collapsed view.
+    """
+    level_of = {node: level for level, nodes in levels.items() for node in nodes}
+    ordered = sorted(graph.nodes, key=lambda node: (level_of[node], node))
+
+    cluster_ids = {}
+    clusters = []
+    rows = []
+    row_of = {}
+    for node in ordered:
+        level = level_of[node]
+        x, y = positions[node]
+        cluster = cluster_of(node, level, cluster_mode)
+        if cluster not in cluster_ids:
+            cluster_ids[cluster] = len(clusters)
+            clusters.append({"label": cluster, "size": 0, "x": 0.0, "y": 0.0, "level": level})
+        info = clusters[cluster_ids[cluster]]
+        info["size"] += 1
+        info["x"] += x
+        info["y"] += y
+        row_of[node] = len(rows)
+        rows.append([node, round(x, 1), round(y, 1), level, cluster_ids[cluster]])
+    for info in clusters:
+        info["x"] = round(info["x"] / info["size"], 1)
+        info["y"] = round(info["y"] / info["size"], 1)
+
+    edges = []
+    cluster_edges = {}
+    for u, v in graph.edges:
+        edges.append([row_of[u], row_of[v]])
+        cu, cv = rows[row_of[u]][4], rows[row_of[v]][4]
+        if cu != cv:
+            cluster_edges[(cu, cv)] = cluster_edges.get((cu, cv), 0) + 1
+
+    return {
+        "version": 1,
+        "cluster_mode": cluster_mode,
+        "nodes": rows,
+        "edges": edges,
+        "clusters": clusters,
+        "cluster_edges": [[cu, cv, count] for (cu, cv), count in cluster_edges.items()],
+    }
+
+class PyvisProgress:
+    """Colour nodes in the pyvis HTML graph as they are processed."""
+
+    def __init__(self, net, html_path):
+        self.net = net
+        self.html_path = html_path
+
+    def mark_processing(self, nodes):
+        nodes = set(nodes)
+        for n in self.net.nodes:
+            if n['id'] in nodes:
+                n['color'] = 'orange'
+        self.net.save_graph(self.html_path)
+
+    def mark_done(self, node):
+        for n in self.net.nodes:
+            if n['id'] == node:
+                n['color'] = 'green'
+        self.net.save_graph(self.html_path)
+
+    def close(self):
+        pass
+
+class CompactProgress:
+    """Track node status for the compact graph in a small, throttled status file."""
+
+    def __init__(self, data, status_path, min_interval=1.0):
+        self.row_of = {row[0]: i for i, row in enumerate(data["nodes"])}
+        self.status_path = status_path
+        self.min_interval = min_interval
+        self.processing = set()
+        self.done = set()
+        self._last_write = 0.0
+        self._write()
+
+    def _write(self, force=True):
+        now = time.time()
+        if not force and now - self._last_write < self.min_interval:
+            return
+        self._last_write = now
+        atomic_write_text(self.status_path, json.dumps({
+            "processing": sorted(self.processing),
+            "done": sorted(self.done),
+        }))
+
+    def mark_processing(self, nodes):
+        self.processing |= {self.row_of[node] for node in nodes if node in self.row_of}
+        self._write()
+
+    def mark_done(self, node):
+        row = self.row_of.get(node)
+        if row is not None:
+            self.processing.discard(row)
+            self.done.add(row)
+        self._write(force=False)
+
+    def close(self):
+        self._write()
@@ -0,0 +1,133 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+
+LOG_LEVELS = {"debug": 10, "info": 20, "warning": 30, "error": 40}
+LOG_BUFFER_SIZE = int(os.getenv("LOG_BUFFER_SIZE", "5000"))
+
+# Worker threads log concurrently; each line is written whole under this lock so lines never interleave
+_write_lock = threading.Lock()
+
+def log_event(message, level="info", stage="main", node=None, duration=None):
+    """Emit one log event from the pipeline.
+
+    With LOG_FORMAT=json (set by the server) the event is printed as a JSON
+    line the server parses into a structured entry; otherwise it is printed
+    as plain text for the CLI.
+    """
+    if os.getenv("LOG_FORMAT") == "json":
+        event = {"msg": str(message), "level": level, "stage": stage, "ts": time.time()}
+        if node is not None:
+            event["node"] = node
+        if duration is not None:
+            event["duration"] = round(duration, 3)
+        line = json.dumps(event)
+    else:
+        line = str(message)
+    with _write_lock:
+        sys.stdout.write(line + "\n")
+        sys.stdout.flush()
+
+def format_entry(entry):
+    """Render an entry as the single text line shown in the UI console."""
+    prefix = f"[{entry['stage']}]" if entry.get("stage") else ""
+    level = "" if entry["level"] == "info" else f" {entry['level'].upper()}:"
+    return f"{prefix}{level} {entry['msg']}".strip()
+
+class JobLog:
+    """Structured log for one job, held in a bounded ring buffer.
+
+    Entries evicted from the buffer are appended to spill_path as JSON lines,
+    so long jobs keep a complete log on disk with bounded memory.
+    """
+
+    def __init__(self, capacity=LOG_BUFFER_SIZE, spill_path=None):
+        self._entries = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._spill_file = None
+        self._seq = 0
+        self.spill_path = spill_path
+        self.spilled = 0
+
+    def reset(self, spill_path=None):
+        """Clear the buffer for a new job."""
+        with self._lock:
+            self._entries.clear()
+            self._close_spill()
+            self._seq = 0
+            self.spill_path = spill_path
+            self.spilled = 0
+
+    def close(self):
+        """Close the spill file once the job is finished; a later overflow reopens it for appending."""
+        with self._lock:
+            self._close_spill()
+
+    def _close_spill(self):
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+
+    def _spill(self, entry):
+        if not self.spill_path:
+            return
+        if self._spill_file is None:
+            self._spill_file = open(self.spill_path, "a", encoding="utf-8")
+        self._spill_file.write(json.dumps(entry) + "\n")
+        self._spill_file.flush()
+
+    def append(self, message, level="info", stage=None, node=None, duration=None, ts=None):
+        with self._lock:
+            self._seq += 1
+            entry = {
+                "seq": self._seq,
+                "ts": ts if ts is not None else time.time(),
+                "level": level if level in LOG_LEVELS else "info",
+                "stage": stage,
+                "node": node,
+                "duration": duration,
+                "msg": message,
+            }
+            if len(self._entries) == self._entries.maxlen:
+                self._spill(self._entries[0])
+                self.spilled += 1
+            self._entries.append(entry)
+            return entry
+
+    def append_line(self, line, stage="main"):
+        """Record a line of pipeline output, parsing it when it is a structured event."""
+        line = line.strip()
+        if line.startswith("{"):
+            try:
+                event = json.loads(line)
+            except ValueError:
+                event = None
+            if isinstance(event, dict) and "msg" in event:
+                return self.append(event["msg"], level=event.get("level", "info"),
+                                   stage=event.get("stage", stage), node=event.get("node"),
+                                   duration=event.get("duration"), ts=event.get("ts"))
+        # Unstructured output (tracebacks, library prints) is kept as-is
+        level = "error" if "Traceback" in line or "Error" in line else "info"
+        return self.append(line, level=level, stage=stage)
+
+    def query(self, since=0, level=None, node=None, stage=None, limit=None):
+        """Return buffered entries after seq `since`, filtered by minimum level, node and stage."""
+        min_level = LOG_LEVELS.get(level, 0) if level else 0
+        with self._lock:
+            entries = [
+                entry for entry in self._entries
+                if entry["seq"] > since
+                and LOG_LEVELS[entry["level"]] >= min_level
+                and (node is None or entry["node"] == node)
+                and (stage is None or entry["stage"] == stage)
+            ]
+        if limit:
+            entries = entries[-limit:]
+        return entries
+
+    @property
+    def last_seq(self):
+        return self._seq
@@ -1,28 +1,52 @@
 import networkx as nx
 
-def segregate_levels(graph):
-    """Segregate nodes into levels and capture dependency function import info."""
-    levels = {}         # level index -> set of nodes
+def segregate_components(graph, condensed=None):
+    """Segregate strongly connected components into levels and capture dependency function import info.
+
+    Import cycles are condensed into single components so every file gets a
+    level. A component's level is the length of the longest chain of
+    components it depends on, so all of its dependencies are in earlier
+    levels. Dependencies only list parents outside the node's own component.
+    Pass a precomputed condensation to avoid building it again.
+    """
+    if condensed is None:
+        condensed = nx.condensation(graph)
+    component_of = condensed.graph["mapping"]
+    levels = {}         # level index -> list of components (frozensets of nodes)
     dependencies = {}   # child node -> dict { parent_node: imported_functions }
-    level = 0
-    # Start with leaf nodes (no incoming edges)
-    current_level_nodes = {node for node in graph.nodes if graph.in_degree(node) == 0}
+    for level, generation in enumerate(nx.topological_generations(condensed)):
+        levels[level] = [frozenset(condensed.nodes[component]["members"]) for component in sorted(generation)]
 
-    while current_level_nodes:
-        levels[level] = current_level_nodes
-        next_level_nodes = set()
-        for node in graph.nodes:
-            if node in set().union(*levels.values()):
-                continue
-            mapping = {}
-            for pred in graph.predecessors(node):
-                if pred in current_level_nodes:
-                    funcs = graph.edges[pred, node].get("imported_functions", set())
-                    mapping[pred] = funcs
-            if mapping:
-                next_level_nodes.add(node)
-                dependencies[node] = mapping
-        current_level_nodes = next_level_nodes
-        level += 1
+    for node in graph.nodes:
+        mapping = {}
+        for pred in graph.predecessors(node):
+            if component_of[pred] != component_of[node]:
+                mapping[pred] = graph.edges[pred, node].get("imported_functions", set())
+        if mapping:
+            dependencies[node] = mapping
 
     return levels, dependencies
+
+def segregate_levels(graph):
+    """Segregate nodes into levels and capture dependency function import info."""
+    component_levels, dependencies = segregate_components(graph)
+    levels = {level: set().union(*components) for level, components in component_levels.items()}
+    return levels, dependencies
+
+def cycle_context(graph, component, index):
+    """Summarise the members of an import cycle so they can be documented in parallel.
+
+    Built from the AST index and the graph alone, without any LLM call: what
+    each member defines and which names the members import from each other.
+    """
+    lines = ["These files import each other in a cycle and are documented together:"]
+    for member in sorted(component):
+        entry = index["files"].get(member, {}) if index else {}
+        top_level = [qualname for kind, qualname, *_ in entry.get("symbols", []) if "." not in qualname]
+        lines.append(f"- {member} defines: {', '.join(top_level) or 'no top-level classes or functions'}")
+    for parent in sorted(component):
+        for child in sorted(graph.successors(parent)):
+            if child in component:
+                funcs = sorted(graph.edges[parent, child].get("imported_functions", set()))
+                lines.append(f"- {child} imports {', '.join(funcs) or 'the module'} from {parent}")
+    return "\n".join(lines)
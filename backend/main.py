@@ -1,14 +1,28 @@
 import os
 from dotenv import load_dotenv
 load_dotenv()
-from openai import OpenAI
+from openai import OpenAI, RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from create_graph import build_dependency_graph
-from level_segregation import segregate_levels
+from ast_index import undocumented_function_nodes
+from routing import (classify_function, template_docstring, batch_prompt, parse_batch_response, routing_settings,
+                     TIER_MODELS, TIER_TEMPLATE, TIER_BATCH, TIER_FULL)
+from level_segregation import cycle_context
+from planner import analyze_project, plan_schedule
+from output_writer import make_writer, atomic_write_text
+from concurrency import AdaptiveConcurrencyLimiter
+from dedup import DocCache, duplicate_groups
+from joblog import log_event
+from profiling import profile_stage, enable_profiling, profiling_default
+from graph_view import (is_large_graph, load_or_compute_layout, compact_graph,
+                        PyvisProgress, CompactProgress)
+from graph_store import CompactDependencyGraph, SummaryStore, dependents_of, memory_bounded_default
+import json
 import multiprocessing
 import ast
 import astor
 import time
+import tempfile
+import sys
 from pyvis.network import Network
 import networkx as nx
 
@@ -18,10 +32,10 @@ def extract_text_from_file(file_path):
             content = file.read()
         return content
     except FileNotFoundError:
-        print(f"Error: The file at {file_path} was not found.")
+        log_event(f"Error: The file at {file_path} was not found.", level="error", stage="read")
         return None
     except Exception as e:
-        print(f"An error occurred: {e}")
+        log_event(f"An error occurred: {e}", level="error", stage="read")
         return None
 
 # def process_node(node, project_root, dependencies):
@@ -60,24 +74,58 @@ def extract_text_from_file(file_path):
     
 #     return f"Processed {node}"
 
-# Global storage for function summaries:
-node_function_summaries = {}  # { parent_node: { function_name: summary } }
-
-def process_node(node, project_root, dependencies):
-    print(f"Processing node: {node}")
-    sanitized_file_name = node.replace("\\/", "\/")
-    full_path = os.path.join(project_root, sanitized_file_name)
-    file_content = extract_text_from_file(full_path)
-    
-    if not file_content:
-        return f"Failed to process {node}"
-    
-    if node_function_summaries and node in node_function_summaries:
-        functions = {}
-        
-        for func in node_function_summaries[node].keys():
-            functions[func] = node_function_summaries[node][func]
-        
+# Global storage for function summaries, keyed by the node that imports the functions
+node_function_summaries = SummaryStore()
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+# Failures that mean the API is overloaded and the limiter should back off; others are the request's own fault
+OVERLOAD_ERRORS = (APITimeoutError, APIConnectionError, InternalServerError)
+
+# Documented results keyed by content hash; persisted in DOC_CACHE_DIR so later jobs reuse them
+doc_cache = DocCache(os.getenv("DOC_CACHE_DIR", os.path.join(tempfile.gettempdir(), "code_scribe_cache")))
+
+def log_concurrency_change(before, after, metrics):
+    log_event(f"[metrics] LLM concurrency limit {before} -> {after} {metrics}", stage="metrics")
+
+# One limiter shared by every worker thread; it adapts in-flight requests to latency and 429s
+llm_limiter = AdaptiveConcurrencyLimiter(
+    initial=int(os.getenv("LLM_INITIAL_CONCURRENCY", "4")),
+    minimum=int(os.getenv("LLM_MIN_CONCURRENCY", "1")),
+    maximum=int(os.getenv("LLM_MAX_CONCURRENCY", "16")),
+    target_latency=float(os.getenv("LLM_TARGET_LATENCY", "0")) or None,
+    on_change=log_concurrency_change,
+)
+
+def chat_completion(client, messages, model="gpt-4.1-nano", rank=0):
+    """Send a chat completion through the adaptive limiter, retrying rate-limited requests.
+
+    rank is the file's position in the schedule; lower ranks get free slots first.
+    """
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        try:
+            with llm_limiter.slot(is_throttle=lambda ex: isinstance(ex, RateLimitError),
+                                  is_overload=lambda ex: isinstance(ex, OVERLOAD_ERRORS), rank=rank):
+                return client.chat.completions.create(model=model, messages=messages)
+        except RateLimitError:
+            if attempt == LLM_MAX_RETRIES:
+                raise
+            delay = 2 ** attempt
+            log_event(f"Rate limited, retrying in {delay} seconds (limit now {llm_limiter.limit})",
+                      level="warning", stage="llm")
+            time.sleep(delay)
+
+def document_file(node, file_content, shared_context=None, rank=0, functions=None):
+    """Generate the overview comment and missing docstrings for one file's source.
+
+    functions holds the summaries of functions this file imports from files documented earlier.
+    """
+    # Parse before any LLM request so a file that doesn't parse costs nothing
+    with profile_stage("parse"):
+        tree = ast.parse(file_content)
+        undocumented = undocumented_function_nodes(tree)
+        tiers = {key: classify_function(func_node) for key, func_node in undocumented}
+
+    if functions:
         prompt = f"""{file_content}
         Generate comprehensive Python file documentation following IEEE 1016 and GNU coding standards.
 
@@ -103,6 +151,12 @@ def process_node(node, project_root, dependencies):
         NO MARKDOWN TAGS OR ANYTHING ELSE."""
     
 
+    if shared_context:
+        prompt += f"""
+
+        {shared_context}
+        Use this summary of the other files in the cycle to understand how this file fits with them."""
+
     history = [
         {
             "role": "user",
@@ -113,13 +167,11 @@ def process_node(node, project_root, dependencies):
     start_time = time.time()
     client = OpenAI()
     client.api_key = os.getenv("OPENAI_API_KEY")
-    response = client.chat.completions.create(
-        model="gpt-4.1-nano",
-        messages=history
-    )
+    response = chat_completion(client, history, model=TIER_MODELS[TIER_FULL], rank=rank)
     end_time = time.time()
     elapsed_time = end_time - start_time
-    print(f"Time taken for {node} overall documentation: {elapsed_time:.2f} seconds")
+    log_event(f"Time taken for {node} overall documentation: {elapsed_time:.2f} seconds",
+              stage="overview", node=node, duration=elapsed_time)
     
     history.append(response.choices[0].message)
 
@@ -130,7 +182,7 @@ def process_node(node, project_root, dependencies):
     func_documented = {}
 
     def generate_docstring(func_node):
-        """Generate a basic docstring for a function node."""
+        """Generate a docstring for a function node on the file's full conversation history."""
         func_name = func_node.name
         func_prompt = (
                 f"For the file {node}, generate a Python docstring for the function '{func_name}' that explains its purpose, "
@@ -143,58 +195,123 @@ def process_node(node, project_root, dependencies):
                 })
         
         start_time = time.time()
-        response_func = client.chat.completions.create(
-            model="gpt-4.1-nano",
-            messages=history
-        )
+        response_func = chat_completion(client, history, model=TIER_MODELS[TIER_FULL], rank=rank)
         end_time = time.time()
         elapsed_time = end_time - start_time
-        print(f"Time taken for {node} function docstring: {elapsed_time:.2f} seconds")
+        log_event(f"Time taken for {node} function docstring: {elapsed_time:.2f} seconds",
+                  stage="docstring", node=node, duration=elapsed_time)
         history.append(response_func.choices[0].message)
-        doc = f'"""{response_func.choices[0].message.content.strip()}"""'
-        func_documented[func_name] = response_func.choices[0].message.content.strip()
-        time.sleep(20)
-        return doc
+        return response_func.choices[0].message.content.strip().strip('"""').strip()
+
+    def generate_batch_docstrings(batch):
+        """Document all simple functions of the file in one cheap request, keyed by undocumented_function_nodes key."""
+        sources = {key: ast.get_source_segment(file_content, func_node) or func_node.name
+                   for key, func_node in batch}
+        start_time = time.time()
+        response_batch = chat_completion(
+            client, [{"role": "user", "content": batch_prompt(node, sources)}], model=TIER_MODELS[TIER_BATCH],
+            rank=rank,
+        )
+        elapsed_time = time.time() - start_time
+        log_event(f"Time taken for {node} batch of {len(batch)} docstrings: {elapsed_time:.2f} seconds",
+                  stage="batch", node=node, duration=elapsed_time)
+        batch_docs = parse_batch_response(response_batch.choices[0].message.content)
+        missing = [key for key, _ in batch if key not in batch_docs]
+        if missing:
+            log_event(f"Batch response for {node} had no docstring for {len(missing)} of {len(batch)} functions, "
+                      f"using templates for: {missing}", level="warning", stage="batch", node=node)
+        return batch_docs
+
+    # Route each undocumented function: trivial ones get a local template, simple ones share
+    # one batched request, and only complex ones get their own full request.
+    batch = [(key, func_node) for key, func_node in undocumented if tiers[key] == TIER_BATCH]
+    batch_docs = generate_batch_docstrings(batch) if batch else {}
+    log_event(f"Routing for {node}: {sum(t == TIER_TEMPLATE for t in tiers.values())} template, "
+              f"{len(batch)} batched, {sum(t == TIER_FULL for t in tiers.values())} full",
+              stage="routing", node=node)
+
+    docstrings = {}  # id(function node) -> docstring text
+    for key, func_node in undocumented:
+        tier = tiers[key]
+        if tier == TIER_FULL:
+            doc = generate_docstring(func_node)
+        else:
+            # Batched functions the model skipped fall back to the template
+            doc = batch_docs.get(key) or template_docstring(func_node)
+        docstrings[id(func_node)] = doc
+        func_documented[func_node.name] = doc
 
     class DocstringInserter(ast.NodeTransformer):
         def visit_FunctionDef(self, node):
             self.generic_visit(node)
-            # Check if the function already has a docstring
-            if not (node.body and isinstance(node.body[0], ast.Expr) and isinstance(node.body[0].value, ast.Str)):
-                # No docstring, so create one
-                docstring = generate_docstring(node)
+            docstring = docstrings.get(id(node))
+            if docstring is not None:
                 # Create a new node for the docstring and insert it at the start of the function body
-                doc_node = ast.Expr(value=ast.Str(s=docstring.strip('"""')))
+                doc_node = ast.Expr(value=ast.Constant(value=docstring))
                 node.body.insert(0, doc_node)
             return node
 
-    def insert_docstrings(source_code):
-        tree = ast.parse(source_code)
+        # Async functions need docstrings too
+        visit_AsyncFunctionDef = visit_FunctionDef
+
+    with profile_stage("rewrite"):
         tree = DocstringInserter().visit(tree)
         # Optionally fix the missing locations (only needed if you plan to use this AST further)
         ast.fix_missing_locations(tree)
-        return astor.to_source(tree)
-    
-    file_content = extract_text_from_file(full_path)
-    
-    updated_source = insert_docstrings(file_content)
+        updated_source = astor.to_source(tree)
 
     final_source = overall_doc_comment + "\n\n" + updated_source
+
+    return final_source, func_documented
+
+def process_node(node, project_root, dependents, writer=None, shared_context=None, rank=0):
+    """Document one file, write it out and pass its function summaries on to its dependents.
+
+    dependents maps each file importing from this one to the functions it imports;
+    rank is the file's position in its level's priority order.
+    """
+    log_event(f"Processing node: {node}", stage="process", node=node)
+    sanitized_file_name = node.replace("\\/", "\/")
+    full_path = os.path.join(project_root, sanitized_file_name)
+    file_content = extract_text_from_file(full_path)
     
-    with open(full_path, "w", encoding="utf-8") as file:
-        file.write(final_source)
-
-    print("Documentation generation completed for file:", node)
-
-    print("Starting to look for dependencies of file:", node)    
-    # Find parents in the dependency graph that depend on the current node.
-    # For example, given Dependencies: {'task_manager.py': {'storage.py': {'load_tasks', 'save_tasks'}, ...}, ...}
-    dependents = {}  # { parent_node: set(functions) }
-    for parent_node, child_mapping in dependencies.items():
-        if node in child_mapping:
-            dependents[parent_node] = child_mapping[node]
+    if not file_content:
+        return f"Failed to process {node}"
     
-    print("Adding function summaries for dependents of file:", node)
+    # Taken (and, in memory-bounded mode, released) whether or not the cache has the result
+    functions = node_function_summaries.take(node)
+    # Identical content with identical context is documented once; duplicates in this upload
+    # or earlier jobs reuse the result
+    cache_key = doc_cache.key(file_content, context={
+        "routing": routing_settings(),
+        "functions": functions,
+        "shared_context": shared_context,
+    })
+    cached = doc_cache.lookup_or_claim(cache_key)
+    if cached is not None:
+        log_event(f"Reusing documentation of identical content for file: {node}", stage="dedup", node=node)
+        final_source, func_documented = cached["source"], cached["functions"]
+    else:
+        try:
+            final_source, func_documented = document_file(node, file_content, shared_context, rank, functions)
+        except BaseException:
+            doc_cache.abandon(cache_key)
+            raise
+        try:
+            doc_cache.complete(cache_key, {"source": final_source, "functions": func_documented})
+        except Exception as e:
+            # The result is still good for this file; only later duplicates lose the cached copy
+            log_event(f"Could not cache documentation for file: {node}: {e}", level="warning", stage="dedup", node=node)
+    
+    # Hand the result to the output writer; without one, overwrite the source in place
+    if writer is None:
+        writer = make_writer(project_root, mode="inplace")
+    with profile_stage("output"):
+        writer.write(sanitized_file_name, final_source)
+
+    log_event(f"Documentation generation completed for file: {node}", stage="process", node=node)
+
+    log_event(f"Adding function summaries for dependents of file: {node}", level="debug", stage="process", node=node)
     # For every parent dependent, query the agent for a summary of each used function.
     if dependents:
         for parent, functions in dependents.items():
@@ -219,77 +336,171 @@ def process_node(node, project_root, dependencies):
                 # history.append(response_func.choices[0].message)
                 # summary_text = response_func.choices[0].message.content.strip()
                 func_summaries_for_parent[func] = func_documented.get(func)
-            if node_function_summaries.get(parent) is None:
-                node_function_summaries[parent] = func_summaries_for_parent
-            else:
-                node_function_summaries[parent].update(func_summaries_for_parent)
+            node_function_summaries.add(parent, func_summaries_for_parent)
 
 
     return f"Processed {node}"
 
-def main():
+def main(plan_only=False, memory_bounded=None, profile=None):
+    if memory_bounded is None:
+        memory_bounded = memory_bounded_default()
+    if profile is None:
+        profile = profiling_default()
     project_root = input("Enter the project root directory: ").strip()
     if not os.path.isdir(project_root):
-        print("Invalid directory. Please check the path.")
+        log_event("Invalid directory. Please check the path.", level="error")
         return
-    graph = build_dependency_graph(project_root)
-
-    visualize_graph = graph
-
-    print("Nodes:", graph.nodes)
-    print("Edges:", graph.edges)
-
-    for u, v, data in visualize_graph.edges(data=True):
-        for key in data:
-            if isinstance(data[key], set):
-                data[key] = list(data[key])
-            
-    # Plot with pyvis
-    net = Network(
-        directed = True
-    )
-    net.from_nx(visualize_graph) # Create directly from nx graph
-    net.save_graph(f'{project_root}.html')
-
-    print(graph)
+    if not profile:
+        run_pipeline(project_root, plan_only, memory_bounded)
+        return
+    # Non-LLM stages are profiled with cProfile; results are written next to the project
+    profiler = enable_profiling(f'{project_root}.profile')
+    try:
+        run_pipeline(project_root, plan_only, memory_bounded)
+    finally:
+        log_event(f"Profile written to {profiler.close()}", stage="profile")
+
+def run_pipeline(project_root, plan_only=False, memory_bounded=False):
+    """Analyse the project, then document it level by level (or only plan it)."""
+    # Parse every file once; the index drives graph building, planning and work estimates.
+    # Import cycles are condensed into components so every file gets a level, and the
+    # nodes on the longest downstream chains are ordered first so they don't stretch the run.
+    index, graph, component_levels, dependencies, work, scores = analyze_project(
+        project_root, index_path=f'{project_root}.index.json', memory_bounded=memory_bounded and not plan_only)
+    duplicates = duplicate_groups(index)
+    if duplicates:
+        log_event(f"{sum(len(group) - 1 for group in duplicates)} files have the same content as another; those with the same context too will reuse its documentation",
+                  stage="dedup")
+
+    if not memory_bounded:
+        log_event(f"Nodes: {graph.nodes}", level="debug", stage="graph")
+        log_event(f"Edges: {graph.edges}", level="debug", stage="graph")
+
+    log_event(str(graph), stage="graph")
 
     # Get Levels
-    levels, dependencies = segregate_levels(graph)
+    levels = {level: set().union(*components) for level, components in component_levels.items()}
+
+    if not memory_bounded:
+        log_event(f"Levels: {levels}", level="debug", stage="levels")
+        log_event(f"Dependencies: {dependencies}", level="debug", stage="levels")
+    log_event(f"{len(levels)} levels; critical path length: {max(scores.values(), default=0)} requests "
+              f"of {sum(work.values())} total", stage="schedule")
+
+    if plan_only:
+        # Dry run: estimate the schedule and cost, then stop before any LLM call
+        with profile_stage("plan"):
+            plan = plan_schedule(graph, index, component_levels, dependencies)
+        atomic_write_text(f'{project_root}.plan.json', json.dumps(plan, indent=2))
+        summary = {key: value for key, value in plan.items() if key not in ("nodes", "per_level")}
+        log_event(f"Plan: {json.dumps(summary)}", stage="plan")
+        return
 
-    print("Levels:", levels)
-    print("Dependencies:", dependencies)
-    
-    # Map node names to pyvis node ids (usually the same as the node name)
-    node_id_map = {str(node): str(node) for node in graph.nodes}
-
-    for level in levels:
-        print(f"Processing level {level} ...")
-        curr_level = list(levels[level])
-
-        # Set current level nodes to orange before processing
-        for n in net.nodes:
-            if n['id'] in curr_level:
-                n['color'] = 'orange'
-        net.save_graph(f'{project_root}.html')
-
-        # Use ThreadPoolExecutor for parallel processing
-        with ThreadPoolExecutor() as executor:
-            futures = {executor.submit(process_node, node, project_root, dependencies): node for node in curr_level}
-            for future in as_completed(futures):
-                node = futures[future]
-                print(future.result())
-                # Update node color in pyvis to green after processing
-                for n in net.nodes:
-                    if n['id'] == node:
-                        n['color'] = 'green'
-                net.save_graph(f'{project_root}.html')
-        print(f"Completed processing level {level}.")
-        print("Agents sleeping for 60 seconds to avoid rate limits.")
-        time.sleep(30)
-
-    # Save final graph
-    
+    if memory_bounded or is_large_graph(graph):
+        # Large graphs: lay out once on the server and ship a compact JSON graph instead of pyvis HTML
+        log_event(f"Large graph ({graph.number_of_nodes()} nodes), writing compact graph JSON", stage="graph")
+        with profile_stage("graph_view"):
+            positions = load_or_compute_layout(graph, levels)
+            graph_data = compact_graph(graph, levels, positions)
+            atomic_write_text(f'{project_root}.graph.json', json.dumps(graph_data, separators=(",", ":")))
+        progress = CompactProgress(graph_data, f'{project_root}.status.json')
+    else:
+        with profile_stage("graph_view"):
+            visualize_graph = graph.copy()
+            for u, v, data in visualize_graph.edges(data=True):
+                for key in data:
+                    if isinstance(data[key], set):
+                        data[key] = list(data[key])
+
+            # Plot with pyvis
+            net = Network(
+                directed = True
+            )
+            net.from_nx(visualize_graph) # Create directly from nx graph
+            net.save_graph(f'{project_root}.html')
+        progress = PyvisProgress(net, f'{project_root}.html')
+
+    # Members of a cycle are documented in parallel from one shared summary of the cycle
+    shared_contexts = {}
+    for components in component_levels.values():
+        for component in components:
+            if len(component) > 1:
+                log_event(f"Import cycle of {len(component)} files: {sorted(component)}", stage="levels")
+                context = cycle_context(graph, component, index)
+                for node in component:
+                    shared_contexts[node] = context
+
+    if memory_bounded:
+        # Planning is done: keep only what documenting needs. The index is on disk, the graph
+        # shrinks to int adjacency arrays, the drawn graph is on disk (progress only keeps its
+        # row numbers), and summaries are dropped once their node is documented.
+        graph = CompactDependencyGraph.from_networkx(graph)
+        del index, dependencies, levels, work, scores, positions, graph_data
+        node_function_summaries.release = True
+        log_event(f"Memory-bounded mode: compact graph of {graph.number_of_nodes()} nodes", stage="memory")
+
+    writer = make_writer(project_root)
+    log_event(f"Writing documented files with {type(writer).__name__}", stage="output")
+    # A single long-lived pool serves every level; the limiter, not the pool size, bounds LLM load
+    executor = ThreadPoolExecutor(max_workers=llm_limiter.maximum)
+    succeeded = False
+    try:
+        failed = process_levels(component_levels, graph, shared_contexts, project_root, progress, writer, executor)
+        succeeded = True
+    finally:
+        executor.shutdown()
+        progress.close()
+        # Only a finished run publishes its output (e.g. renames the streamed ZIP into place)
+        with profile_stage("output"):
+            writer.close(success=succeeded)
+    log_event("Output written.", stage="output")
+    if failed:
+        log_event(f"{len(failed)} files could not be documented and were left unchanged: {sorted(failed)}",
+                  level="warning", stage="output")
+    log_event(f"[metrics] LLM requests {llm_limiter.snapshot()}", stage="metrics")
+
+def process_levels(component_levels, graph, shared_contexts, project_root, progress, writer, executor):
+    """Document every level in order, streaming finished files to the writer.
+
+    Each level is a list of components in priority order; a component's
+    members are submitted together so a cycle is scheduled as one unit.
+    Dependents are read from the graph (networkx or compact) per node, and
+    each node's LLM requests carry its rank so the limiter keeps this order.
+    Files that fail are logged and returned; the writer carries them over unchanged.
+    """
+    failed = []
+    for level, components in component_levels.items():
+        log_event(f"Processing level {level} ...", stage="levels")
+        curr_level = [node for component in components for node in component]
+        component_of = {node: component for component in components for node in component}
+
+        # Mark current level nodes as in progress (orange) before processing
+        progress.mark_processing(curr_level)
+
+        # Nodes run in parallel on the shared pool
+        futures = {
+            executor.submit(process_node, node, project_root, dependents_of(graph, node, exclude=component_of[node]),
+                            writer, shared_contexts.get(node), rank): node
+            for rank, node in enumerate(curr_level)
+        }
+        for future in as_completed(futures):
+            node = futures[future]
+            try:
+                log_event(future.result(), stage="process", node=node)
+            except Exception as ex:
+                # One failed file must not stop the run; it is carried over undocumented
+                failed.append(node)
+                log_event(f"Failed to process {node}: {type(ex).__name__}: {ex}", level="error",
+                          stage="process", node=node)
+                continue
+            log_event(f"[metrics] LLM concurrency {llm_limiter.snapshot()}", level="debug", stage="metrics")
+            # Mark the node as done (green) after processing
+            progress.mark_done(node)
+        log_event(f"Completed processing level {level}.", stage="levels")
+    return failed
 
 if __name__ == "__main__":
-    main()
+    main(plan_only="--plan" in sys.argv or os.getenv("PLAN_ONLY") == "1",
+         memory_bounded=True if "--memory-bounded" in sys.argv else None,
+         profile=True if "--profile" in sys.argv else None)
 
@@ -0,0 +1,175 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+import zipfile
+
+# Output modes understood by make_writer (selected with the OUTPUT_MODE env var)
+OUTPUT_MODES = ("inplace", "dir", "zip")
+
+def default_file_mode():
+    """The mode a plain open() would give a new file under the current umask."""
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+def atomic_write_text(path, text, mode_from=None):
+    """Write text to path through a temporary file and an atomic rename.
+
+    The file keeps the permissions of mode_from (default: the file being replaced).
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        # mkstemp files are always 0600; keep the mode of the file being replaced
+        try:
+            shutil.copymode(mode_from or path, tmp_path)
+        except FileNotFoundError:
+            os.chmod(tmp_path, default_file_mode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def atomic_copy_file(src, dst):
+    """Copy src to dst, with its permissions, through a temporary file and an atomic rename."""
+    directory = os.path.dirname(dst) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_")
+    os.close(fd)
+    try:
+        shutil.copyfile(src, tmp_path)
+        shutil.copymode(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def iter_project_files(project_root, exclude=()):
+    """Yield (relative path, absolute path) for every file under project_root, skipping excluded paths."""
+    excluded = {os.path.abspath(path) for path in exclude}
+    for dirpath, dirnames, filenames in os.walk(project_root):
+        dirnames[:] = [d for d in dirnames if os.path.abspath(os.path.join(dirpath, d)) not in excluded]
+        for filename in filenames:
+            full_path = os.path.join(dirpath, filename)
+            if os.path.abspath(full_path) in excluded:
+                continue
+            yield os.path.relpath(full_path, project_root), full_path
+
+def prune_directory(directory, max_files=None, max_age=None):
+    """Delete files older than max_age seconds, then the oldest beyond max_files, to bound a cache directory."""
+    try:
+        entries = [entry for entry in os.scandir(directory) if entry.is_file()]
+    except OSError:
+        return
+    entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+    now = time.time()
+    for i, entry in enumerate(entries):
+        if (max_files is not None and i >= max_files) or (max_age and now - entry.stat().st_mtime > max_age):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass  # another job may have removed it already
+
+class InPlaceWriter:
+    """Overwrite the source files inside the project tree."""
+
+    def __init__(self, project_root):
+        self.project_root = project_root
+
+    def write(self, rel_path, text):
+        atomic_write_text(os.path.join(self.project_root, rel_path), text)
+
+    def close(self, success=True):
+        pass
+
+class DirectoryWriter:
+    """Write documented files to a separate output directory, leaving sources untouched."""
+
+    def __init__(self, project_root, output_dir):
+        self.project_root = project_root
+        self.output_dir = output_dir
+        self._written = set()
+        self._lock = threading.Lock()
+        os.makedirs(output_dir, exist_ok=True)
+
+    def write(self, rel_path, text):
+        atomic_write_text(os.path.join(self.output_dir, rel_path), text,
+                          mode_from=os.path.join(self.project_root, rel_path))
+        with self._lock:
+            self._written.add(os.path.normpath(rel_path))
+
+    def close(self, success=True):
+        if not success:
+            return  # a failed run leaves only the files documented so far
+        # Carry over every file that was not documented so the output is a complete tree
+        for rel_path, full_path in iter_project_files(self.project_root, exclude=[self.output_dir]):
+            if os.path.normpath(rel_path) not in self._written:
+                atomic_copy_file(full_path, os.path.join(self.output_dir, rel_path))
+
+class ZipWriter:
+    """Stream documented files straight into the result ZIP as each one finishes.
+
+    The archive is built at a temporary path and renamed into place only when
+    the run succeeded, so readers never observe a half-written ZIP; a failed
+    run leaves the `.part` file behind for inspection.
+    """
+
+    def __init__(self, project_root, output_path):
+        self.project_root = project_root
+        self.output_path = output_path
+        self._tmp_path = f"{output_path}.part"
+        self._zip = zipfile.ZipFile(self._tmp_path, "w", compression=zipfile.ZIP_DEFLATED)
+        self._written = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _arcname(rel_path):
+        return os.path.normpath(rel_path).replace(os.sep, "/")
+
+    def write(self, rel_path, text):
+        arcname = self._arcname(rel_path)
+        # Take the entry's mode and timestamp from the source file, as the files copied on close get
+        try:
+            entry = zipfile.ZipInfo.from_file(os.path.join(self.project_root, rel_path), arcname)
+        except OSError:
+            entry = zipfile.ZipInfo(arcname, date_time=time.localtime()[:6])
+            entry.external_attr = (0o100000 | default_file_mode()) << 16
+        entry.compress_type = zipfile.ZIP_DEFLATED
+        with self._lock:
+            self._zip.writestr(entry, text)
+            self._written.add(arcname)
+
+    def close(self, success=True):
+        with self._lock:
+            if not success:
+                self._zip.close()
+                return
+            # Only files that were never documented are read back from disk
+            for rel_path, full_path in iter_project_files(
+                self.project_root, exclude=[self.output_path, self._tmp_path]
+            ):
+                arcname = self._arcname(rel_path)
+                if arcname not in self._written:
+                    self._zip.write(full_path, arcname)
+            self._zip.close()
+            os.replace(self._tmp_path, self.output_path)
+
+def make_writer(project_root, mode=None, output_path=None):
+    """Create the output writer selected by mode / OUTPUT_MODE (inplace, dir or zip)."""
+    mode = (mode or os.getenv("OUTPUT_MODE", "inplace")).lower()
+    output_path = output_path or os.getenv("OUTPUT_PATH")
+    if mode not in OUTPUT_MODES:
+        raise ValueError(f"Unknown output mode {mode!r}, expected one of {OUTPUT_MODES}")
+    if mode == "inplace":
+        return InPlaceWriter(project_root)
+    root = os.path.normpath(project_root)
+    if mode == "dir":
+        return DirectoryWriter(project_root, output_path or f"{root}_documented")
+    return ZipWriter(project_root, output_path or f"{root}_documented.zip")
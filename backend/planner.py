@@ -0,0 +1,164 @@
+import heapq
+import os
+import networkx as nx
+from ast_index import build_project_index, undocumented_spans, save_index, index_stats, trim_index
+from create_graph import build_dependency_graph, get_python_files
+from level_segregation import segregate_components, cycle_context
+from scheduling import estimate_work, critical_path_scores, prioritize_components
+from routing import TIER_BATCH, TIER_FULL
+from joblog import log_event
+from profiling import profile_stage
+
+# Token and latency model used to estimate a run without calling the LLM
+CHARS_PER_TOKEN = 4
+PROMPT_OVERHEAD_TOKENS = 150     # instructions wrapped around the file content
+FUNCTION_PROMPT_TOKENS = 70      # per-function docstring request
+OVERVIEW_COMPLETION_TOKENS = int(os.getenv("PLAN_OVERVIEW_TOKENS", "600"))
+DOCSTRING_COMPLETION_TOKENS = int(os.getenv("PLAN_DOCSTRING_TOKENS", "200"))
+BATCH_DOCSTRING_COMPLETION_TOKENS = int(os.getenv("PLAN_BATCH_DOCSTRING_TOKENS", "80"))
+TOKENS_PER_LINE = 10             # source lines of batched functions sent in the batch prompt
+LATENCY_BASE = float(os.getenv("PLAN_LATENCY_BASE", "0.5"))              # seconds per request
+OUTPUT_TOKENS_PER_SECOND = float(os.getenv("PLAN_OUTPUT_TPS", "100"))
+INPUT_TOKENS_PER_SECOND = float(os.getenv("PLAN_INPUT_TPS", "5000"))
+# Defaults are gpt-4.1-nano list prices in USD per million tokens
+PRICE_INPUT_PER_MTOK = float(os.getenv("PRICE_INPUT_PER_MTOK", "0.10"))
+PRICE_OUTPUT_PER_MTOK = float(os.getenv("PRICE_OUTPUT_PER_MTOK", "0.40"))
+
+def analyze_project(project_root, index_path=None, memory_bounded=False):
+    """Index the project and build its graph, levels and priorities; no LLM calls are made.
+
+    The full index is saved to index_path when given. In memory-bounded mode it
+    is then trimmed before levelling, so levelling reuses the memory it held.
+    """
+    with profile_stage("index"):
+        index = build_project_index(project_root, get_python_files(project_root))
+    with profile_stage("graph"):
+        graph = build_dependency_graph(project_root, index=index)
+    work = {node: estimate_work(index["files"][node]) for node in graph.nodes}
+    if index_path:
+        save_index(index, index_path)
+        log_event(f"Index stats: {index_stats(index)}", stage="index")
+    if memory_bounded:
+        trim_index(index)
+    with profile_stage("levels"):
+        # Levelling and scoring share one condensation of the graph
+        condensed = nx.condensation(graph)
+        component_levels, dependencies = segregate_components(graph, condensed)
+        scores = critical_path_scores(graph, work, condensed)
+        del condensed
+        component_levels = {level: prioritize_components(components, scores, work)
+                            for level, components in component_levels.items()}
+    return index, graph, component_levels, dependencies, work, scores
+
+def estimate_tokens(text_or_size):
+    """Rough token count for a string or a size in characters."""
+    size = text_or_size if isinstance(text_or_size, int) else len(text_or_size)
+    return max(1, size // CHARS_PER_TOKEN)
+
+def estimate_latency(prompt_tokens, completion_tokens):
+    """Estimated wall-clock seconds for one chat completion."""
+    return LATENCY_BASE + prompt_tokens / INPUT_TOKENS_PER_SECOND + completion_tokens / OUTPUT_TOKENS_PER_SECOND
+
+def estimate_node_requests(entry, imported_functions=0, shared_context=None):
+    """Return (prompt_tokens, completion_tokens) for each request a file needs, in order.
+
+    Mirrors document_file: one overview request, one batched request for all
+    functions routed to the batch tier, then one request per full-tier
+    function on the same, growing conversation history. Templated functions
+    cost nothing.
+    """
+    history = estimate_tokens(entry["size"]) + PROMPT_OVERHEAD_TOKENS
+    history += imported_functions * DOCSTRING_COMPLETION_TOKENS
+    if shared_context:
+        history += estimate_tokens(shared_context)
+    requests = [(history, OVERVIEW_COMPLETION_TOKENS)]
+    history += OVERVIEW_COMPLETION_TOKENS
+    batch_spans = undocumented_spans(entry, TIER_BATCH)
+    if batch_spans:
+        requests.append((PROMPT_OVERHEAD_TOKENS + sum(batch_spans) * TOKENS_PER_LINE,
+                         len(batch_spans) * BATCH_DOCSTRING_COMPLETION_TOKENS))
+    for _ in undocumented_spans(entry, TIER_FULL):
+        history += FUNCTION_PROMPT_TOKENS
+        requests.append((history, DOCSTRING_COMPLETION_TOKENS))
+        history += DOCSTRING_COMPLETION_TOKENS
+    return requests
+
+def simulate_level(durations, concurrency):
+    """Makespan of running files (already in priority order) on `concurrency` workers."""
+    workers = [0.0] * max(1, min(concurrency, len(durations)))
+    for duration in durations:
+        heapq.heapreplace(workers, workers[0] + duration)
+    return max(workers, default=0.0)
+
+def plan_schedule(graph, index, component_levels, dependencies, concurrency=None, rpm=None, tpm=None):
+    """Estimate requests, tokens, cost and wall-clock time of documenting the project.
+
+    Levels run one after another; within a level files are list-scheduled on
+    `concurrency` workers in priority order, and a level never finishes faster
+    than the requests-per-minute and tokens-per-minute limits allow. Files
+    with identical content, the same import-cycle context and the same
+    imported functions are only counted once, as they share one cache entry
+    and are documented once.
+    """
+    concurrency = concurrency or int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+    rpm = rpm if rpm is not None else float(os.getenv("LLM_RPM", "0"))
+    tpm = tpm if tpm is not None else float(os.getenv("LLM_TPM", "0"))
+
+    seen_keys = set()  # (sha256, cycle context, imported names) of files already estimated
+    nodes = {}
+    per_level = []
+    total_seconds = 0.0
+    for level, components in component_levels.items():
+        durations = []
+        level_requests = level_tokens = 0
+        for component in components:
+            context = cycle_context(graph, component, index) if len(component) > 1 else None
+            for node in component:
+                entry = index["files"][node]
+                imported_names = frozenset(func for funcs in dependencies.get(node, {}).values() for func in funcs)
+                dedup_key = (entry["sha256"], context, imported_names)
+                if dedup_key in seen_keys:
+                    nodes[node] = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                   "seconds": 0.0, "duplicate": True}
+                    continue
+                seen_keys.add(dedup_key)
+                imported = sum(len(funcs) for funcs in dependencies.get(node, {}).values())
+                requests = estimate_node_requests(entry, imported, context)
+                prompt_tokens = sum(p for p, _ in requests)
+                completion_tokens = sum(c for _, c in requests)
+                seconds = sum(estimate_latency(p, c) for p, c in requests)
+                nodes[node] = {"requests": len(requests), "prompt_tokens": prompt_tokens,
+                               "completion_tokens": completion_tokens, "seconds": round(seconds, 2)}
+                durations.append(seconds)
+                level_requests += len(requests)
+                level_tokens += prompt_tokens + completion_tokens
+        level_seconds = simulate_level(durations, concurrency)
+        if rpm:
+            level_seconds = max(level_seconds, level_requests / rpm * 60)
+        if tpm:
+            level_seconds = max(level_seconds, level_tokens / tpm * 60)
+        total_seconds += level_seconds
+        per_level.append({"level": level, "files": len(durations), "requests": level_requests,
+                          "tokens": level_tokens, "seconds": round(level_seconds, 2)})
+
+    prompt_tokens = sum(n["prompt_tokens"] for n in nodes.values())
+    completion_tokens = sum(n["completion_tokens"] for n in nodes.values())
+    cost = (prompt_tokens * PRICE_INPUT_PER_MTOK + completion_tokens * PRICE_OUTPUT_PER_MTOK) / 1_000_000
+    return {
+        "files": len(nodes),
+        "duplicate_files": sum(1 for n in nodes.values() if n.get("duplicate")),
+        "levels": len(component_levels),
+        "concurrency": concurrency,
+        "requests": sum(n["requests"] for n in nodes.values()),
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "estimated_cost_usd": round(cost, 4),
+        "estimated_seconds": round(total_seconds, 1),
+        "per_level": per_level,
+        "nodes": nodes,
+    }
+
+def plan_project(project_root, **limits):
+    """Analyse a project and return its dry-run plan without making any LLM calls."""
+    index, graph, component_levels, dependencies, _, _ = analyze_project(project_root)
+    return plan_schedule(graph, index, component_levels, dependencies, **limits)
@@ -0,0 +1,131 @@
+import cProfile
+import itertools
+import json
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from output_writer import atomic_write_text
+
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))  # functions listed per stage in the summary
+
+def profiling_default():
+    """Profiling is off unless PROFILE_PIPELINE=1."""
+    return os.getenv("PROFILE_PIPELINE") == "1"
+
+def top_functions(stats, limit=PROFILE_TOP):
+    """The functions with the highest cumulative time in a pstats.Stats, as JSON-ready rows."""
+    rows = []
+    for (filename, lineno, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{os.path.basename(filename)}:{lineno}({name})" if lineno else name,
+            "ncalls": ncalls,
+            "tottime": round(tottime, 4),
+            "cumtime": round(cumtime, 4),
+        })
+    rows.sort(key=lambda row: row["cumtime"], reverse=True)
+    return rows[:limit]
+
+class StageProfiler:
+    """Profile named, non-LLM pipeline stages with cProfile.
+
+    Each thread profiles its own runs of a stage, without any shared lock, so
+    worker threads keep their real schedule; close() merges the per-thread
+    profiles and writes <stage>.prof files and summary.json. A stage entered
+    inside another is attributed to the outer one.
+
+    Up to Python 3.11 cProfile only sees the thread that enabled it. From 3.12
+    it hooks the whole process and only one profile can be active at a time:
+    a worker-thread stage that overlaps another thread's is then timed but not
+    profiled (counted as unprofiled_runs), and its functions can include other
+    threads' work. Main-thread stages run before or after the workers and are
+    accurate on every version.
+    """
+
+    def __init__(self, output_dir, top=PROFILE_TOP):
+        self.output_dir = output_dir
+        self.top = top
+        self._profiles = {}  # (stage, thread id) -> cProfile.Profile
+        self._timings = {}   # stage -> {"runs": n, "unprofiled_runs": n, "seconds": wall time summed over threads}
+        self._lock = threading.Lock()  # guards the dicts above, never held while profiling
+        self._active = threading.local()
+        self._thread_numbers = itertools.count()  # thread idents are reused, so threads get their own number
+
+    @contextmanager
+    def stage(self, name):
+        if getattr(self._active, "stage", None):
+            yield
+            return
+        if not hasattr(self._active, "number"):
+            self._active.number = next(self._thread_numbers)
+        key = (name, self._active.number)
+        with self._lock:
+            profile = self._profiles.get(key)
+            if profile is None:
+                profile = self._profiles[key] = cProfile.Profile()
+        self._active.stage = name
+        start = time.perf_counter()
+        try:
+            profile.enable()
+            profiled = True
+        except ValueError:
+            profiled = False  # Python 3.12+: another thread's stage is being profiled
+        try:
+            yield
+        finally:
+            if profiled:
+                profile.disable()
+            seconds = time.perf_counter() - start
+            self._active.stage = None
+            with self._lock:
+                timing = self._timings.setdefault(name, {"runs": 0, "unprofiled_runs": 0, "seconds": 0.0})
+                timing["runs"] += 1
+                timing["unprofiled_runs"] += not profiled
+                timing["seconds"] += seconds
+
+    def _merged_stats(self):
+        """Merge each stage's per-thread profiles into one pstats.Stats per stage."""
+        merged = {}
+        for (name, _), profile in self._profiles.items():
+            profile.create_stats()
+            if not profile.stats:
+                continue
+            if name in merged:
+                merged[name].add(profile)
+            else:
+                merged[name] = pstats.Stats(profile)
+        return merged
+
+    def close(self):
+        """Write the per-stage profiles and the summary; returns the summary path."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        with self._lock:
+            merged = self._merged_stats()
+            stages = {}
+            for name, timing in self._timings.items():
+                stats = merged.get(name)
+                if stats is not None:
+                    stats.dump_stats(os.path.join(self.output_dir, f"{name}.prof"))
+                stages[name] = {
+                    "runs": timing["runs"],
+                    "unprofiled_runs": timing["unprofiled_runs"],
+                    "threads": sum(1 for stage, _ in self._profiles if stage == name),
+                    "seconds": round(timing["seconds"], 3),
+                    "top": top_functions(stats, self.top) if stats is not None else [],
+                }
+            summary_path = os.path.join(self.output_dir, "summary.json")
+            atomic_write_text(summary_path, json.dumps({"stages": stages}, indent=2))
+        return summary_path
+
+# The pipeline's profiler; None unless profiling was enabled for this run
+pipeline_profiler = None
+
+def enable_profiling(output_dir):
+    global pipeline_profiler
+    pipeline_profiler = StageProfiler(output_dir)
+    return pipeline_profiler
+
+def profile_stage(name):
+    """Profile a block as the named stage when profiling is enabled, otherwise do nothing."""
+    return pipeline_profiler.stage(name) if pipeline_profiler is not None else nullcontext()
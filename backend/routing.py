@@ -0,0 +1,109 @@
+import ast
+import json
+import os
+import re
+
+# Tiers, from cheapest to most expensive
+TIER_TEMPLATE = "template"  # docstring generated locally from the signature, no LLM call
+TIER_BATCH = "batch"        # documented together with the file's other simple functions in one cheap request
+TIER_FULL = "full"          # its own request on the file's full conversation history
+
+TRIVIAL_MAX_STATEMENTS = int(os.getenv("ROUTE_TRIVIAL_MAX_STATEMENTS", "2"))
+SIMPLE_MAX_STATEMENTS = int(os.getenv("ROUTE_SIMPLE_MAX_STATEMENTS", "12"))
+SIMPLE_MAX_COMPLEXITY = int(os.getenv("ROUTE_SIMPLE_MAX_COMPLEXITY", "4"))
+
+# Per-tier model settings
+TIER_MODELS = {
+    TIER_BATCH: os.getenv("MODEL_BATCH", "gpt-4.1-nano"),
+    TIER_FULL: os.getenv("MODEL_FULL", "gpt-4.1-nano"),
+}
+
+def routing_settings():
+    """The settings that decide how a file's functions are routed and which models document them."""
+    return {
+        "trivial_max_statements": TRIVIAL_MAX_STATEMENTS,
+        "simple_max_statements": SIMPLE_MAX_STATEMENTS,
+        "simple_max_complexity": SIMPLE_MAX_COMPLEXITY,
+        "models": TIER_MODELS,
+    }
+
+BRANCH_NODES = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler, ast.IfExp,
+                ast.With, ast.AsyncWith, ast.Assert, ast.comprehension)
+# match statements only exist on Python 3.10+
+if hasattr(ast, "match_case"):
+    BRANCH_NODES += (ast.match_case,)
+
+def count_statements(func_node):
+    """Count the statements in a function body, including nested blocks."""
+    return sum(1 for node in ast.walk(func_node) if isinstance(node, ast.stmt)) - 1
+
+def cyclomatic_complexity(func_node):
+    """Approximate McCabe complexity: one plus the number of decision points."""
+    complexity = 1
+    for node in ast.walk(func_node):
+        if isinstance(node, BRANCH_NODES):
+            complexity += 1
+        elif isinstance(node, ast.BoolOp):
+            complexity += len(node.values) - 1
+    return complexity
+
+def classify_function(func_node):
+    """Route a function to a tier by its size and complexity."""
+    statements = count_statements(func_node)
+    complexity = cyclomatic_complexity(func_node)
+    if statements <= TRIVIAL_MAX_STATEMENTS and complexity == 1:
+        return TIER_TEMPLATE
+    if statements <= SIMPLE_MAX_STATEMENTS and complexity <= SIMPLE_MAX_COMPLEXITY:
+        return TIER_BATCH
+    return TIER_FULL
+
+def _describe_name(name):
+    words = name.strip("_").replace("_", " ").strip()
+    if name == "__init__":
+        return "Initialise the instance"
+    for prefix, verb in (("get ", "Return the"), ("is ", "Check whether it is"), ("has ", "Check whether it has"),
+                         ("set ", "Set the"), ("to ", "Convert to")):
+        if words.startswith(prefix):
+            return f"{verb} {words[len(prefix):]}"
+    return (words[:1].upper() + words[1:]) if words else "Run the function"
+
+def template_docstring(func_node):
+    """Build a PEP 257 docstring for a trivial function from its name and signature."""
+    lines = [f"{_describe_name(func_node.name)}."]
+    args = [arg for arg in func_node.args.posonlyargs + func_node.args.args + func_node.args.kwonlyargs
+            if arg.arg not in ("self", "cls")]
+    if func_node.args.vararg:
+        args.append(func_node.args.vararg)
+    if func_node.args.kwarg:
+        args.append(func_node.args.kwarg)
+    if args:
+        lines += ["", "Args:"]
+        for arg in args:
+            annotation = f" ({ast.unparse(arg.annotation)})" if arg.annotation is not None else ""
+            lines.append(f"    {arg.arg}{annotation}: The {arg.arg.replace('_', ' ')}.")
+    returns_value = any(isinstance(node, ast.Return) and node.value is not None for node in ast.walk(func_node))
+    if returns_value or (func_node.returns is not None and ast.unparse(func_node.returns) != "None"):
+        annotation = f"{ast.unparse(func_node.returns)}: " if func_node.returns is not None else ""
+        lines += ["", "Returns:", f"    {annotation}The result of {func_node.name}."]
+    return "\n".join(lines)
+
+def batch_prompt(node, sources):
+    """Prompt asking for docstrings of several simple functions in one request."""
+    listing = "\n\n".join(f"# {name}\n{source}" for name, source in sources.items())
+    return (
+        f"For the file {node}, write a concise Python docstring for each of the functions below. "
+        f"Explain the purpose, parameters and return value, following PEP 257. "
+        f"Return only a JSON object mapping each function name, exactly as written after #, to its "
+        f"docstring text, without quotes around the docstring and without markdown.\n\n{listing}"
+    )
+
+def parse_batch_response(text):
+    """Parse the JSON object returned for a batch prompt, tolerating markdown fences."""
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text.strip())
+    try:
+        docs = json.loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(docs, dict):
+        return {}
+    return {name: doc.strip() for name, doc in docs.items() if isinstance(doc, str) and doc.strip()}
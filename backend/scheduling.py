@@ -0,0 +1,45 @@
+import networkx as nx
+from ast_index import undocumented_tiers
+from routing import TIER_BATCH, TIER_FULL
+
+def estimate_work(entry):
+    """Estimate the LLM requests needed for an indexed file.
+
+    One overview, one per undocumented function routed to the full tier, and
+    one shared request if any functions are batched; templated ones are free.
+    """
+    tiers = undocumented_tiers(entry)
+    return 1 + tiers.get(TIER_FULL, 0) + (1 if tiers.get(TIER_BATCH) else 0)
+
+def critical_path_scores(graph, work, condensed=None):
+    """Score each node by the heaviest path of work from it through its dependents.
+
+    Scores are computed on the graph's condensation so import cycles do not
+    break the longest-path computation; members of a cycle share a score.
+    Pass a precomputed condensation to avoid building it again.
+    """
+    if condensed is None:
+        condensed = nx.condensation(graph)
+    component_of = condensed.graph["mapping"]
+    downstream = {}
+    for component in reversed(list(nx.topological_sort(condensed))):
+        own_work = sum(work.get(node, 1) for node in condensed.nodes[component]["members"])
+        downstream[component] = own_work + max(
+            (downstream[succ] for succ in condensed.successors(component)), default=0
+        )
+    return {node: downstream[component_of[node]] for node in graph.nodes}
+
+def prioritize(nodes, scores, work):
+    """Order nodes so the longest downstream chains, then the biggest files, start first."""
+    return sorted(nodes, key=lambda node: (scores.get(node, 0), work.get(node, 0), node), reverse=True)
+
+def prioritize_components(components, scores, work):
+    """Order components as units by their critical-path score, keeping each component's members together."""
+    def component_key(component):
+        return (max(scores.get(node, 0) for node in component),
+                sum(work.get(node, 0) for node in component),
+                min(component))
+    ordered = []
+    for component in sorted(components, key=component_key, reverse=True):
+        ordered.append(prioritize(component, scores, work))
+    return ordered
@@ -1,7 +1,8 @@
 from fastapi import FastAPI, UploadFile, File, Form
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, FileResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
+import json
 import shutil
 import zipfile
 import threading
@@ -9,8 +10,13 @@ import subprocess
 import asyncio
 import tempfile  # add at top
 import sys  # at top
-import dropbox  # Dropbox SDK for upload
 import smtplib
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from delivery import make_delivery_backend
+from ast_index import load_index, index_stats
+from planner import plan_project
+from joblog import JobLog, format_entry
 from email.mime.text import MIMEText
 from dotenv import load_dotenv  # load environment from .env
 
@@ -27,119 +33,183 @@ app.add_middleware(
 )
 
 # Global state for logs and graph HTML
-logs: list[str] = []
+job_log = JobLog()  # bounded, structured log of the current job
 processing = False
 graph_html: str = ""
+job_root: str = ""  # extracted project of the current job; main.py writes its artifacts next to it
+
+def log(message: str, level: str = "info"):
+    """Record a server-side event in the current job's log"""
+    job_log.append(message, level=level, stage="server")
+
+# Uploads and email notifications run here so they never hold up a processing thread
+delivery_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="delivery")
+notification_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="notify")
 
 @app.post("/api/upload")
-async def upload(file: UploadFile = File(...), email: str = Form(...)):
-    """Receive ZIP file and email, start background processing"""
-    global logs, processing, graph_html
-    # Reset state
-    logs.clear()
-    graph_html = ""
-    processing = True
-    logs.append(f"[server] /api/upload called, email={email}, filename={file.filename}")
+async def upload(file: UploadFile = File(...), email: str = Form(...), profile: bool = Form(False)):
+    """Receive ZIP file and email, start background processing (profiling the non-LLM stages if asked)"""
+    global processing, graph_html, job_root
     # Create an isolated temp directory outside project root to avoid reload triggers
     temp_dir = tempfile.mkdtemp(prefix="code_scribe_")
-    logs.append(f"[server] Using system temp directory at {temp_dir}")
+    # Reset state; log entries that overflow the in-memory buffer spill to a file next to the job
+    job_log.reset(spill_path=f"{temp_dir}.log.jsonl")
+    graph_html = ""
+    processing = True
+    log(f"/api/upload called, email={email}, filename={file.filename}, profile={profile}")
+    log(f"Using system temp directory at {temp_dir}")
+    job_root = temp_dir
 
     # Save and extract zip
     zip_path = os.path.join(temp_dir, file.filename)
-    logs.append(f"[server] Saving uploaded zip to {zip_path}")
+    log(f"Saving uploaded zip to {zip_path}")
     content = await file.read()
     with open(zip_path, 'wb') as f:
         f.write(content)
-    logs.append("[server] Zip saved, beginning extraction")
+    log("Zip saved, beginning extraction")
     with zipfile.ZipFile(zip_path, 'r') as zip_ref:
         zip_ref.extractall(temp_dir)
-    logs.append("[server] Extraction complete")
+    log("Extraction complete")
 
     # Start background thread to run main.py
     def run_process():
-        global logs, processing, graph_html
-        logs.append("[server] Starting background processing thread")
+        global processing, graph_html
+        log("Starting background processing thread")
         # Diagnostics: log cwd and script location
         cwd_before = os.getcwd()
         script_path = os.path.abspath(__file__)
         backend_dir = os.path.dirname(script_path)
-        logs.append(f"[server] cwd before launch: {cwd_before}")
-        logs.append(f"[server] server.py path: {script_path}")
-        logs.append(f"[server] using backend_dir: {backend_dir}")
+        log(f"cwd before launch: {cwd_before}")
+        log(f"server.py path: {script_path}")
+        log(f"using backend_dir: {backend_dir}")
+        result_zip = f"{temp_dir}.zip"
         try:
             # Use the same Python interpreter and absolute script path
             python_exec = sys.executable or 'python'
             main_script = os.path.join(backend_dir, 'main.py')
-            logs.append(f"[server] Launching subprocess: {python_exec} -u {main_script}")
+            log(f"Launching subprocess: {python_exec} -u {main_script}")
+            # Documented files are streamed straight into the result ZIP; the extracted sources stay untouched
+            proc_env = dict(os.environ, OUTPUT_MODE='zip', OUTPUT_PATH=result_zip, LOG_FORMAT='json')
+            if profile:
+                proc_env['PROFILE_PIPELINE'] = '1'
             proc = subprocess.Popen(
                 [python_exec, '-u', main_script],
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
                 text=True,
-                env=os.environ
+                env=proc_env
             )
         except Exception as ex:
-            logs.append(f"[server] Failed to start subprocess: {ex}")
+            log(f"Failed to start subprocess: {ex}", level="error")
             processing = False
+            job_log.close()
             return
         # Provide project root input
         proc.stdin.write(temp_dir + '\n')
         proc.stdin.flush()
-        logs.append(f"[server] Provided project root to subprocess: {temp_dir}")
+        log(f"Provided project root to subprocess: {temp_dir}")
         # Read output lines
+        html_file = f"{temp_dir}.html"
+        html_mtime = None
         for line in proc.stdout:
-            logs.append(line.strip())
-            # Update graph HTML if file exists
-            html_file = f"{temp_dir}.html"
-            logs.append(f"[server] Checking for graph HTML file at location: {temp_dir}")
-            if os.path.exists(html_file):
+            if not line.strip():
+                continue
+            job_log.append_line(line)
+            # Reload the graph HTML only when main.py has rewritten it
+            try:
+                mtime = os.path.getmtime(html_file)
+            except OSError:
+                continue
+            if mtime != html_mtime:
                 try:
                     with open(html_file, 'r', encoding='utf-8') as hf:
                         graph_html = hf.read()
+                    html_mtime = mtime
                 except Exception:
                     pass
         proc.wait()
-        logs.append(f"[server] Subprocess completed with exit code {proc.returncode}")
+        log(f"Subprocess completed with exit code {proc.returncode}")
         processing = False
+        # Later server events stay in the buffer; the spill file is complete for this job
+        job_log.close()
 
-        # Create a zip of the documented project for download
-        result_zip = f"{temp_dir}.zip"
-        logs.append(f"[server] Creating result ZIP at {result_zip}")
-        shutil.make_archive(temp_dir, 'zip', temp_dir)
-        logs.append("[server] Result ZIP created")
-
-        # Upload result ZIP to Dropbox and get shareable link
-        dropbox_token = os.getenv('DROPBOX_ACCESS_TOKEN')
-        if not dropbox_token:
-            logs.append("[server] ERROR: DROPBOX_ACCESS_TOKEN is not set in the environment")
+        # A failed run must not be delivered as if it were fully documented
+        if proc.returncode != 0:
+            log(f"Processing failed with exit code {proc.returncode}; result will not be delivered", level="error")
+            return
+        # The subprocess already wrote the result ZIP while documenting files
+        if not os.path.exists(result_zip):
+            log(f"Result ZIP was not produced at {result_zip}", level="error")
             return
-        dbx = dropbox.Dropbox(dropbox_token)
-        dest_path = '/' + os.path.basename(result_zip)
-        with open(result_zip, 'rb') as f:
-            dbx.files_upload(f.read(), dest_path, mute=True)
-        shared_url = dbx.sharing_create_shared_link_with_settings(dest_path).url
-        link = shared_url.replace('?dl=0', '?dl=1')  # direct download link
-        logs.append(f"[server] Uploaded to Dropbox: {link}")
-
-        # Send email notification with MEGA link
-        email_subject = "Your documented code is ready"
-        email_body = f"Your code has been documented. Download it here: {link}"
-        send_email(email, email_subject, email_body)
-        logs.append(f"[server] Sent email notification to {email}")
+        log(f"Result ZIP ready at {result_zip}")
+
+        delivery_pool.submit(deliver_result, result_zip, email)
 
     thread = threading.Thread(target=run_process, daemon=True)
     thread.start()
     return {"message": "Processing started"}
 
+def deliver_result(result_zip: str, email: str):
+    """Upload the result with the configured delivery backend, then notify the user asynchronously"""
+    try:
+        backend = make_delivery_backend()
+        log(f"Delivering result with the {backend.name} backend")
+        link = backend.deliver(result_zip)
+    except Exception as ex:
+        log(f"Delivery failed: {ex}", level="error")
+        return
+    log(f"Result delivered: {link}")
+
+    email_subject = "Your documented code is ready"
+    email_body = f"Your code has been documented. Download it here: {link}"
+    future = notification_pool.submit(send_email, email, email_subject, email_body)
+
+    def on_sent(done):
+        if done.exception() is not None:
+            log(f"Failed to send email notification to {email}: {done.exception()}", level="error")
+        else:
+            log(f"Sent email notification to {email}")
+
+    future.add_done_callback(on_sent)
+
+@app.post("/api/plan")
+async def plan(file: UploadFile = File(...)):
+    """Dry run: estimate requests, tokens, cost and time for a ZIP without calling the LLM"""
+    temp_dir = tempfile.mkdtemp(prefix="code_scribe_plan_")
+    try:
+        zip_path = os.path.join(temp_dir, file.filename)
+        with open(zip_path, 'wb') as f:
+            f.write(await file.read())
+        project_dir = os.path.join(temp_dir, "project")
+        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
+            zip_ref.extractall(project_dir)
+        # Graph building and AST parsing are CPU-bound; keep them off the event loop
+        return await asyncio.to_thread(plan_project, project_dir)
+    except zipfile.BadZipFile:
+        return JSONResponse(status_code=400, content={"error": "Uploaded file is not a valid ZIP"})
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
 @app.get("/api/logs")
-def get_logs():
-    """Return current logs and processing status"""
+def get_logs(since: int = 0, level: Optional[str] = None, node: Optional[str] = None,
+             stage: Optional[str] = None, limit: Optional[int] = None, format: str = "text"):
+    """Return log entries after `since`, filtered by minimum level, node and stage, plus processing status.
+
+    format=text returns console lines under `logs`; format=entries returns the structured entries under `entries`.
+    """
+    key = "entries" if format == "entries" else "logs"
     try:
-        return {"logs": logs, "processing": processing}
+        entries = job_log.query(since=since, level=level, node=node, stage=stage, limit=limit)
+        return {
+            key: entries if key == "entries" else [format_entry(entry) for entry in entries],
+            "last_seq": job_log.last_seq,
+            "spilled": job_log.spilled,
+            "processing": processing,
+        }
     except Exception as e:
         # On error, return empty logs, not processing
-        return JSONResponse(status_code=200, content={"logs": [], "processing": False})
+        return JSONResponse(status_code=200, content={key: [], "processing": False})
 
 @app.get("/api/graph")
 def get_graph():
@@ -150,6 +220,54 @@ def get_graph():
         # On error return empty content
         return HTMLResponse(content="", status_code=200)
 
+@app.get("/api/graph/data")
+def get_graph_data():
+    """Return the compact JSON graph used for large projects (404 until one is written)"""
+    data_path = f"{job_root}.graph.json"
+    if not job_root or not os.path.exists(data_path):
+        return JSONResponse(status_code=404, content={"nodes": []})
+    return FileResponse(data_path, media_type="application/json")
+
+@app.get("/api/graph/status")
+def get_graph_status():
+    """Return the rows of the compact graph that are in progress or done"""
+    status_path = f"{job_root}.status.json"
+    if not job_root or not os.path.exists(status_path):
+        return {"processing": [], "done": []}
+    return FileResponse(status_path, media_type="application/json")
+
+@app.get("/api/stats")
+def get_stats():
+    """Return code statistics from the current job's AST index"""
+    index_path = f"{job_root}.index.json"
+    if not job_root or not os.path.exists(index_path):
+        return {"stats": None}
+    try:
+        return {"stats": index_stats(load_index(index_path))}
+    except Exception:
+        return {"stats": None}
+
+@app.get("/api/profile")
+def get_profile(stage: Optional[str] = None):
+    """Return the current job's profile summary, or with `stage` that stage's raw cProfile file"""
+    profile_dir = f"{job_root}.profile"
+    summary_path = os.path.join(profile_dir, "summary.json")
+    if not job_root or not os.path.exists(summary_path):
+        return JSONResponse(status_code=404, content={"error": "No profile for the current job"})
+    if stage is None:
+        return FileResponse(summary_path, media_type="application/json")
+    # Only stages named in the summary are served, so `stage` cannot point outside the profile directory
+    with open(summary_path, 'r', encoding='utf-8') as f:
+        stages = json.load(f).get("stages", {})
+    if stage not in stages:
+        return JSONResponse(status_code=404, content={"error": f"Unknown stage {stage}"})
+    prof_path = os.path.join(profile_dir, f"{stage}.prof")
+    # A stage whose runs were all unprofiled has timings in the summary but no .prof file
+    if not os.path.exists(prof_path):
+        return JSONResponse(status_code=404, content={"error": f"No profile data for stage {stage}"})
+    return FileResponse(prof_path, media_type="application/octet-stream",
+                        filename=f"{stage}.prof")
+
 def send_email(recipient_email: str, subject: str, body_text: str):
     """Send a simple plaintext email via SMTP using environment vars"""
     smtp_server = os.getenv('SMTP_SERVER')
@@ -0,0 +1,33 @@
+import ast
+import textwrap
+from ast_index import undocumented_function_nodes
+from routing import batch_prompt, parse_batch_response
+
+PROPERTY_SOURCE = textwrap.dedent("""
+    class Box:
+        @property
+        def value(self):
+            return self._value
+
+        @value.setter
+        def value(self, value):
+            self._value = value
+
+        def clear(self):
+            self._value = None
+""")
+
+def test_property_getter_and_setter_get_distinct_keys():
+    found = undocumented_function_nodes(ast.parse(PROPERTY_SOURCE))
+    keys = [key for key, _ in found]
+    assert keys == ["Box.value:4", "Box.value:8", "Box.clear"]
+    assert [func_node.lineno for _, func_node in found] == [4, 8, 11]
+
+def test_batch_response_maps_back_to_each_accessor():
+    found = undocumented_function_nodes(ast.parse(PROPERTY_SOURCE))
+    sources = {key: ast.get_source_segment(PROPERTY_SOURCE, func_node) for key, func_node in found}
+    prompt = batch_prompt("box.py", sources)
+    assert "# Box.value:4\n" in prompt and "# Box.value:8\n" in prompt
+    docs = parse_batch_response('{"Box.value:4": "Return the value.", "Box.value:8": "Set the value."}')
+    by_line = {func_node.lineno: docs.get(key) for key, func_node in found}
+    assert by_line == {4: "Return the value.", 8: "Set the value.", 11: None}
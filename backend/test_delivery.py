@@ -0,0 +1,73 @@
+import os
+import pytest
+from delivery import DeliveryBackend, LocalDirectoryDelivery, S3Delivery, S3_MIN_PART_SIZE
+
+class FakeS3Client:
+    """In-memory stand-in for a boto3 S3 client that enforces S3's multipart rules, like MinIO does."""
+
+    def __init__(self, fail_on_part=None):
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+        self.fail_on_part = fail_on_part
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload-{len(self.uploads) + 1}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_on_part:
+            raise ConnectionError("connection reset")
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f'"etag-{PartNumber}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        for number in numbers[:-1]:
+            if len(parts[number]) < S3_MIN_PART_SIZE:
+                raise ValueError("EntityTooSmall")
+        self.objects[(Bucket, Key)] = b"".join(parts[number] for number in numbers)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+        self.aborted.append(UploadId)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.example/{Params['Bucket']}/{Params['Key']}?expires={ExpiresIn}"
+
+@pytest.fixture
+def result_zip(tmp_path):
+    path = tmp_path / "result.zip"
+    path.write_bytes(os.urandom(S3_MIN_PART_SIZE * 2 + 1234))
+    return str(path)
+
+def test_base_backend_is_abstract():
+    with pytest.raises(TypeError):
+        DeliveryBackend()
+
+def test_s3_multipart_upload_round_trips(result_zip):
+    client = FakeS3Client()
+    link = S3Delivery("results", prefix="jobs/", chunk_size=S3_MIN_PART_SIZE, client=client).deliver(result_zip)
+    with open(result_zip, "rb") as f:
+        assert client.objects[("results", "jobs/result.zip")] == f.read()
+    assert link.startswith("https://s3.example/results/jobs/result.zip")
+
+def test_s3_chunk_size_is_raised_to_minimum_part_size(result_zip):
+    client = FakeS3Client()
+    backend = S3Delivery("results", chunk_size=1024, client=client)
+    assert backend.chunk_size == S3_MIN_PART_SIZE
+    backend.deliver(result_zip)
+    assert ("results", "result.zip") in client.objects
+
+def test_s3_failed_upload_is_aborted(result_zip):
+    client = FakeS3Client(fail_on_part=2)
+    with pytest.raises(ConnectionError):
+        S3Delivery("results", client=client).deliver(result_zip)
+    assert client.aborted and not client.uploads and not client.objects
+
+def test_local_delivery_copies_and_links(result_zip, tmp_path):
+    link = LocalDirectoryDelivery(str(tmp_path / "out"), base_url="https://files.example/").deliver(result_zip)
+    assert (tmp_path / "out" / "result.zip").read_bytes() == open(result_zip, "rb").read()
+    assert link == "https://files.example/result.zip"
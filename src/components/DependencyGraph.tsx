@@ -1,13 +1,16 @@
 
 import React, { useEffect, useState } from 'react';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
+import LargeGraph, { CompactGraph, GraphStatus } from './LargeGraph';
 
 interface DependencyGraphProps {
   graphHtml?: string;
+  graphData?: CompactGraph;
+  graphStatus?: GraphStatus;
   isProcessing: boolean;
 }
 
-const DependencyGraph: React.FC<DependencyGraphProps> = ({ graphHtml, isProcessing }) => {
+const DependencyGraph: React.FC<DependencyGraphProps> = ({ graphHtml, graphData, graphStatus, isProcessing }) => {
   const [loaded, setLoaded] = useState(false);
   const [iframeHeight, setIframeHeight] = useState('600px');
 
@@ -48,7 +51,11 @@ const DependencyGraph: React.FC<DependencyGraphProps> = ({ graphHtml, isProcessi
         </CardTitle>
       </CardHeader>
       <CardContent className="dependency-graph-container" style={{ height: iframeHeight }}>
-        {graphHtml ? (
+        {graphData ? (
+          <div className="w-full h-full animate-fade-in">
+            <LargeGraph data={graphData} status={graphStatus} />
+          </div>
+        ) : graphHtml ? (
           <div className="w-full h-full animate-fade-in">
             <iframe
               srcDoc={graphHtml}
@@ -0,0 +1,175 @@
+
+import React, { useEffect, useMemo, useRef, useState } from 'react';
+import { Button } from './ui/button';
+
+// Compact graph format written by backend/graph_view.py
+export interface CompactGraph {
+  version: number;
+  cluster_mode: string;
+  nodes: [string, number, number, number, number][]; // [id, x, y, level, cluster]
+  edges: [number, number][];
+  clusters: { label: string; size: number; x: number; y: number; level: number }[];
+  cluster_edges: [number, number, number][]; // [source cluster, target cluster, edge count]
+}
+
+export interface GraphStatus {
+  processing: number[];
+  done: number[];
+}
+
+interface LargeGraphProps {
+  data: CompactGraph;
+  status?: GraphStatus;
+}
+
+// Nodes and edges drawn per animation frame, so huge graphs never block the main thread
+const CHUNK_SIZE = 2000;
+const COLORS = { pending: '#97c2fc', processing: 'orange', done: 'green', edge: 'rgba(150, 150, 150, 0.35)' };
+
+const LargeGraph: React.FC<LargeGraphProps> = ({ data, status }) => {
+  const canvasRef = useRef<HTMLCanvasElement>(null);
+  const containerRef = useRef<HTMLDivElement>(null);
+  const [collapsed, setCollapsed] = useState(data.nodes.length > 1000 && data.clusters.length < data.nodes.length);
+  const [view, setView] = useState({ scale: 1, x: 0, y: 0 });
+  const [fitted, setFitted] = useState(false);
+  const drag = useRef<{ x: number; y: number } | null>(null);
+
+  const nodeState = useMemo(() => {
+    const state = new Uint8Array(data.nodes.length); // 0 pending, 1 processing, 2 done
+    status?.processing.forEach((row) => { state[row] = 1; });
+    status?.done.forEach((row) => { state[row] = 2; });
+    return state;
+  }, [data, status]);
+
+  const clusterDone = useMemo(() => {
+    const done = new Array(data.clusters.length).fill(0);
+    data.nodes.forEach((node, row) => {
+      if (nodeState[row] === 2) done[node[4]] += 1;
+    });
+    return done;
+  }, [data, nodeState]);
+
+  // Fit the whole layout into the canvas once
+  useEffect(() => {
+    const container = containerRef.current;
+    if (fitted || !container || data.nodes.length === 0) return;
+    let minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+    data.nodes.forEach(([, x, y]) => {
+      minX = Math.min(minX, x); maxX = Math.max(maxX, x);
+      minY = Math.min(minY, y); maxY = Math.max(maxY, y);
+    });
+    const width = container.clientWidth, height = container.clientHeight;
+    const scale = Math.min(width / (maxX - minX + 200), height / (maxY - minY + 200), 1);
+    setView({ scale, x: width / 2 - ((minX + maxX) / 2) * scale, y: height / 2 - ((minY + maxY) / 2) * scale });
+    setFitted(true);
+  }, [data, fitted]);
+
+  useEffect(() => {
+    const canvas = canvasRef.current;
+    const container = containerRef.current;
+    if (!canvas || !container) return;
+    canvas.width = container.clientWidth;
+    canvas.height = container.clientHeight;
+    const ctx = canvas.getContext('2d');
+    if (!ctx) return;
+    ctx.setTransform(1, 0, 0, 1, 0, 0);
+    ctx.clearRect(0, 0, canvas.width, canvas.height);
+    ctx.setTransform(view.scale, 0, 0, view.scale, view.x, view.y);
+
+    // Each step draws one chunk; steps run on successive animation frames
+    const steps: (() => void)[] = [];
+    if (collapsed) {
+      steps.push(() => {
+        ctx.strokeStyle = COLORS.edge;
+        data.cluster_edges.forEach(([from, to, count]) => {
+          const a = data.clusters[from], b = data.clusters[to];
+          ctx.lineWidth = Math.min(1 + Math.log(count), 8) / view.scale;
+          ctx.beginPath(); ctx.moveTo(a.x, a.y); ctx.lineTo(b.x, b.y); ctx.stroke();
+        });
+        data.clusters.forEach((cluster, index) => {
+          const radius = 10 + Math.sqrt(cluster.size) * 4;
+          const fraction = clusterDone[index] / cluster.size;
+          ctx.fillStyle = fraction >= 1 ? COLORS.done : fraction > 0 ? COLORS.processing : COLORS.pending;
+          ctx.beginPath(); ctx.arc(cluster.x, cluster.y, radius, 0, 2 * Math.PI); ctx.fill();
+          ctx.fillStyle = '#1e293b';
+          ctx.font = `${12 / view.scale}px sans-serif`;
+          ctx.fillText(`${cluster.label} (${cluster.size})`, cluster.x + radius + 4, cluster.y + 4);
+        });
+      });
+    } else {
+      for (let start = 0; start < data.edges.length; start += CHUNK_SIZE) {
+        steps.push(() => {
+          ctx.strokeStyle = COLORS.edge;
+          ctx.lineWidth = 1 / view.scale;
+          ctx.beginPath();
+          data.edges.slice(start, start + CHUNK_SIZE).forEach(([from, to]) => {
+            const a = data.nodes[from], b = data.nodes[to];
+            ctx.moveTo(a[1], a[2]); ctx.lineTo(b[1], b[2]);
+          });
+          ctx.stroke();
+        });
+      }
+      const showLabels = view.scale > 0.6;
+      for (let start = 0; start < data.nodes.length; start += CHUNK_SIZE) {
+        steps.push(() => {
+          data.nodes.slice(start, start + CHUNK_SIZE).forEach(([id, x, y], offset) => {
+            const state = nodeState[start + offset];
+            ctx.fillStyle = state === 2 ? COLORS.done : state === 1 ? COLORS.processing : COLORS.pending;
+            ctx.beginPath(); ctx.arc(x, y, 8, 0, 2 * Math.PI); ctx.fill();
+            if (showLabels) {
+              ctx.fillStyle = '#1e293b';
+              ctx.font = `${11 / view.scale}px sans-serif`;
+              ctx.fillText(id, x + 10, y + 4);
+            }
+          });
+        });
+      }
+    }
+
+    let frame = 0;
+    const run = () => {
+      const step = steps.shift();
+      if (!step) return;
+      step();
+      frame = requestAnimationFrame(run);
+    };
+    frame = requestAnimationFrame(run);
+    return () => cancelAnimationFrame(frame);
+  }, [data, collapsed, view, nodeState, clusterDone]);
+
+  const handleWheel = (e: React.WheelEvent<HTMLCanvasElement>) => {
+    const rect = e.currentTarget.getBoundingClientRect();
+    const px = e.clientX - rect.left, py = e.clientY - rect.top;
+    const factor = e.deltaY < 0 ? 1.1 : 1 / 1.1;
+    setView((v) => ({ scale: v.scale * factor, x: px - (px - v.x) * factor, y: py - (py - v.y) * factor }));
+  };
+
+  return (
+    <div ref={containerRef} className="relative w-full h-full">
+      <canvas
+        ref={canvasRef}
+        className="w-full h-full cursor-grab"
+        onWheel={handleWheel}
+        onMouseDown={(e) => { drag.current = { x: e.clientX, y: e.clientY }; }}
+        onMouseMove={(e) => {
+          if (!drag.current) return;
+          const dx = e.clientX - drag.current.x, dy = e.clientY - drag.current.y;
+          drag.current = { x: e.clientX, y: e.clientY };
+          setView((v) => ({ ...v, x: v.x + dx, y: v.y + dy }));
+        }}
+        onMouseUp={() => { drag.current = null; }}
+        onMouseLeave={() => { drag.current = null; }}
+      />
+      <div className="absolute top-2 right-2 flex items-center space-x-2">
+        <span className="text-xs text-muted-foreground">
+          {data.nodes.length} files · {data.clusters.length} {data.cluster_mode === 'level' ? 'levels' : 'packages'}
+        </span>
+        <Button variant="outline" size="sm" className="h-6 px-2 text-xs" onClick={() => setCollapsed(!collapsed)}>
+          {collapsed ? 'Expand files' : 'Collapse'}
+        </Button>
+      </div>
+    </div>
+  );
+};
+
+export default LargeGraph;
@@ -3,15 +3,23 @@ import Header from '../components/Header';
 import FileUpload from '../components/FileUpload';
 import DependencyGraph from '../components/DependencyGraph';
 import ConsoleLog from '../components/ConsoleLog';
+import { CompactGraph, GraphStatus } from '../components/LargeGraph';
 import { useToast } from '../components/ui/use-toast';
 
+// Console lines kept in the browser; older lines remain available from the server's log spill file
+const MAX_CONSOLE_LINES = 5000;
+
 const Index: React.FC = () => {
   const { toast } = useToast();
   const [isProcessing, setIsProcessing] = useState(false);
   const [consoleOpen, setConsoleOpen] = useState(false);
   const [logs, setLogs] = useState<string[]>([]);
   const [graphHtml, setGraphHtml] = useState<string | undefined>(undefined);
+  const [graphData, setGraphData] = useState<CompactGraph | undefined>(undefined);
+  const [graphStatus, setGraphStatus] = useState<GraphStatus | undefined>(undefined);
+  const graphDataLoaded = useRef(false);
   const logsInterval = useRef<number | null>(null);
+  const lastLogSeq = useRef(0);
   const graphInterval = useRef<number | null>(null);
 
   // Function to handle file upload
@@ -19,7 +27,11 @@ const Index: React.FC = () => {
     setIsProcessing(true);
     setConsoleOpen(true);
     setLogs([]);
+    lastLogSeq.current = 0;
     setGraphHtml(undefined);
+    setGraphData(undefined);
+    setGraphStatus(undefined);
+    graphDataLoaded.current = false;
     try {
       const formData = new FormData();
       formData.append('file', file);
@@ -28,10 +40,19 @@ const Index: React.FC = () => {
       // Start polling logs
       const fetchLogs = async () => {
         try {
-          const res = await fetch('/api/logs');
+          // Only fetch entries newer than the last one seen; keep a bounded tail in the console
+          const res = await fetch(`/api/logs?since=${lastLogSeq.current}`);
           if (!res.ok) return;  // skip if server error
           const data = await res.json();
-          setLogs(data.logs);
+          if (data.last_seq < lastLogSeq.current) {
+            // A new job reset the server log
+            lastLogSeq.current = 0;
+            return;
+          }
+          lastLogSeq.current = data.last_seq ?? lastLogSeq.current;
+          if (data.logs.length > 0) {
+            setLogs((prev) => [...prev, ...data.logs].slice(-MAX_CONSOLE_LINES));
+          }
           setIsProcessing(data.processing);
           if (!data.processing) {
             if (logsInterval.current) clearInterval(logsInterval.current);
@@ -43,13 +64,26 @@ const Index: React.FC = () => {
         }
       };
       logsInterval.current = window.setInterval(fetchLogs, 1000);
-      // Start polling graph HTML
+      // Start polling the graph: pyvis HTML for small projects, compact JSON plus status for large ones
       const fetchGraph = async () => {
         try {
+          if (graphDataLoaded.current) {
+            const res = await fetch('/api/graph/status');
+            if (res.ok) setGraphStatus(await res.json());
+            return;
+          }
           const res = await fetch('/api/graph');
           if (!res.ok) return;
           const html = await res.text();
-          setGraphHtml(html);
+          if (html) {
+            setGraphHtml(html);
+            return;
+          }
+          // The compact graph is fetched once, then only its status is polled
+          const dataRes = await fetch('/api/graph/data');
+          if (!dataRes.ok) return;
+          setGraphData(await dataRes.json());
+          graphDataLoaded.current = true;
         } catch (err) {
           // ignore and retry
         }
@@ -126,7 +160,12 @@ const Index: React.FC = () => {
             </div>
             
             <div>
-              <DependencyGraph graphHtml={graphHtml} isProcessing={isProcessing} />
+              <DependencyGraph
+                graphHtml={graphHtml}
+                graphData={graphData}
+                graphStatus={graphStatus}
+                isProcessing={isProcessing}
+              />
             </div>
           </div>
         </div>